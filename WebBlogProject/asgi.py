@@ -3,5 +3,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'WebBlogProject.settings')
+# pod ASGI widoki tylko do odczytu są podmieniane na asynchroniczne (blog.async_urls)
+os.environ.setdefault('ROOT_URLCONF', 'WebBlogProject.asgi_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_profile_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='feed_secret',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    # wersja danych (blog.versions) jest podbijana tylko w istniejącym profilu
+    User = apps.get_model('auth', 'User')
+    Profile = apps.get_model('accounts', 'Profile')
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in User.objects.filter(profile__isnull=True).values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_feed_secret'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
@@ -1 +1,16 @@
+from django.contrib.auth.models import User
 from django.db import models
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
+    default_tags_provisioned = models.BooleanField(default=False)
+    # wersja zadań, kategorii i tagów użytkownika - podstawa ETag i Last-Modified w API (blog.versions)
+    data_version = models.PositiveBigIntegerField(default=0)
+    data_changed_at = models.DateTimeField(blank=True, null=True)
+    # sekret w adresie kanału kalendarza (blog.agenda.feed_token) - nowy sekret unieważnia stary adres
+    feed_secret = models.CharField(max_length=32, blank=True, default='')
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'Profil {self.user}'
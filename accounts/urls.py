@@ -7,6 +7,7 @@ urlpatterns = [
     path('login/', views.login_view, name='accounts-login'),
     path('logout/', views.logout_view, name='accounts-logout'),
     path('profile/', views.profile, name='accounts-profile'),
+    path('profile/calendar/', views.regenerate_calendar_url, name='accounts-calendar-regenerate'),
     path('password-reset/', auth_views.PasswordResetView.as_view(
         template_name='accounts/password_reset.html',
         email_template_name='accounts/password_reset_email.html',
@@ -1,11 +1,20 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 
+from blog import agenda, stats
+from blog.forms import provision_default_tags
+from blog.models import Task
+from blog.pagination import TASK_ORDERING
 from .forms import UserRegisterForm, UserLoginForm
 
 
+# profil pokazuje tylko najbliższe zadania - pełna lista jest stronicowana w task-list
+PROFILE_TASKS = 10
+
+
 @require_http_methods(["GET", "POST"])
 def register(request):
     if request.user.is_authenticated:
@@ -14,6 +23,7 @@ def register(request):
         form = UserRegisterForm(request.POST)
         if form.is_valid():
             user = form.save()
+            provision_default_tags([user])
             login(request, user)
             return redirect('task-list')
     else:
@@ -53,6 +63,18 @@ def logout_view(request):
 def profile(request):
     context = {
         'user': request.user,
-        'tasks': request.user.tasks.all(),
+        'stats': stats.for_user(request.user),
+        'calendar_url': request.build_absolute_uri(
+            f'{reverse("api-agenda-feed")}?token={agenda.feed_token(request.user)}'
+        ),
+        'tasks': Task.objects.filter(author=request.user).order_by(*TASK_ORDERING)[:PROFILE_TASKS],
     }
     return render(request, 'accounts/profile.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def regenerate_calendar_url(request):
+    """Nowy adres kanału kalendarza - poprzedni (np. udostępniony przez pomyłkę) przestaje działać"""
+    agenda.feed_token(request.user, regenerate=True)
+    return redirect('accounts-profile')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Task, Category, Tag
+from .models import CategoryStats, Task, TaskStats, Category, Tag
 
 
 @admin.register(Category)
@@ -20,3 +20,15 @@ class TaskAdmin(admin.ModelAdmin):
     list_filter = ('priority', 'is_completed', 'category', 'due_date')
     search_fields = ('title', 'description')
     ordering = ('is_completed', 'due_date')
+
+
+@admin.register(TaskStats, CategoryStats)
+class StatsAdmin(admin.ModelAdmin):
+    """Liczniki są tylko do podglądu - poprawia je manage.py recompute_task_stats"""
+    list_display = ('__str__', 'total', 'completed')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
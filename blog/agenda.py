@@ -0,0 +1,229 @@
+import heapq
+import secrets
+from datetime import datetime, time as time_of_day, timedelta, timezone as dt_timezone
+from itertools import groupby, takewhile
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.dateparse import parse_date
+
+from accounts.models import Profile
+
+from . import recurrence
+from .models import Task, TaskOccurrence
+
+
+# zakres jednego żądania - od from do to włącznie
+MAX_RANGE_DAYS = 366
+DEFAULT_RANGE_DAYS = 7
+# okno kanału .ics bez parametrów: miesiąc wstecz i rok naprzód od dziś
+FEED_PAST_DAYS = 30
+FEED_DAYS = MAX_RANGE_DAYS
+CHUNK_SIZE = 2000
+FIELDS = (
+    'id', 'title', 'description', 'due_date', 'due_time', 'priority', 'is_completed', 'updated_at',
+    'reminder_date', 'reminder_time', 'reminder_sent_at', 'category_id', 'category__name', 'category__color',
+    'recurrence',
+)
+# kolejność indeksu task_author_due_idx: w obrębie dnia najpierw aktywne, potem ukończone, każde według godziny
+ORDERING = ('due_date', 'is_completed', 'due_time', 'id')
+PRIORITIES = {'high': 1, 'medium': 5, 'low': 9}
+FEED_SALT = 'blog.agenda.feed'
+# id wstawiane do reverse('task-detail') i zamieniane na id kolejnych zadań
+URL_PLACEHOLDER = 987654321
+
+
+def date_range(params, today, default_days=DEFAULT_RANGE_DAYS, past_days=0):
+    """(od, do) z parametrów from i to (RRRR-MM-DD) - ValueError z komunikatem dla użytkownika przy złym zakresie"""
+    dates = {}
+    for name in ('from', 'to'):
+        value = params.get(name)
+        if value:
+            try:
+                dates[name] = parse_date(value)
+            except ValueError:
+                dates[name] = None
+            if dates[name] is None:
+                raise ValueError(f'Parametr {name} musi być datą w formacie RRRR-MM-DD.')
+    start = dates.get('from') or (dates['to'] - timedelta(days=default_days - 1) if 'to' in dates else today - timedelta(days=past_days))
+    end = dates.get('to') or start + timedelta(days=default_days - 1)
+    if end < start:
+        raise ValueError('Data to nie może być wcześniejsza niż from.')
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f'Zakres może obejmować najwyżej {MAX_RANGE_DAYS} dni.')
+    return start, end
+
+
+def sort_key(row):
+    return tuple(row[field] for field in ORDERING)
+
+
+def _occurrence(row, day, completed):
+    shift = day - row['due_date']
+    return {
+        **row,
+        'due_date': day,
+        'is_completed': completed,
+        # przypomnienie przesuwa się z wystąpieniem; wysłane dotyczy tylko bieżącego
+        'reminder_date': row['reminder_date'] + shift if row['reminder_date'] else None,
+        'reminder_sent_at': row['reminder_sent_at'] if not shift else None,
+    }
+
+
+def expand(series, start, end, closed=()):
+    """Czekające wystąpienia serii w zakresie (nie wcześniej niż jej bieżący termin) - generator, niczego nie zapisuje"""
+    rule = recurrence.parse(series['recurrence'])
+    days = takewhile(lambda day: day <= end, recurrence.occurrences(rule, series['due_date'], start))
+    return (_occurrence(series, day, False) for day in days if (series['id'], day) not in closed)
+
+
+def agenda_rows(user, start, end):
+    """Zadania i wystąpienia zadań cyklicznych z terminem w zakresie, w kolejności ORDERING - strumień wierszy
+
+    Zwykłe zadania to jedno zapytanie po zakresie indeksu task_author_due_idx, czytane porcjami. Serie dają
+    wystąpienia wyliczane leniwie od bieżącego terminu, a zamknięte wcześniej wystąpienia przychodzą
+    z TaskOccurrence - strumienie są scalane bez sortowania całości.
+    """
+    single = Task.objects.filter(author=user, recurrence='', due_date__range=(start, end)).order_by(*ORDERING)
+    series = (
+        Task.objects.filter(author=user, is_completed=False, due_date__lte=end).exclude(recurrence='')
+        .order_by().values(*FIELDS)
+    )
+    closed = TaskOccurrence.objects.filter(author=user, date__range=(start, end)).values(
+        'task_id', 'date', 'is_completed', *[f'task__{field}' for field in FIELDS]
+    )
+    closed_keys, completed = set(), []
+    for occurrence in closed:
+        closed_keys.add((occurrence['task_id'], occurrence['date']))
+        if occurrence['is_completed']:
+            row = {field: occurrence[f'task__{field}'] for field in FIELDS}
+            completed.append(_occurrence(row, occurrence['date'], True))
+    completed.sort(key=sort_key)
+    pending = [expand(row, start, end, closed_keys) for row in series]
+    return heapq.merge(single.values(*FIELDS).iterator(chunk_size=CHUNK_SIZE), completed, *pending, key=sort_key)
+
+
+def _reminder(row):
+    if row['reminder_date'] is None or row['reminder_time'] is None:
+        return None
+    return datetime.combine(row['reminder_date'], row['reminder_time'])
+
+
+def agenda_item(row):
+    reminder = _reminder(row)
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'due_time': row['due_time'].isoformat(),
+        'priority': row['priority'],
+        'is_completed': row['is_completed'],
+        'category': {
+            'id': row['category_id'], 'name': row['category__name'], 'color': row['category__color'],
+        } if row['category_id'] else None,
+        'reminder': reminder.isoformat() if reminder else None,
+        'reminder_sent': row['reminder_sent_at'] is not None,
+        'recurring': bool(row['recurrence']),
+    }
+
+
+def group_by_day(rows):
+    """Dni z zadaniami, w jednym przejściu po wierszach posortowanych po due_date - dni bez zadań są pomijane"""
+    return [
+        {'date': day.isoformat(), 'tasks': [agenda_item(row) for row in day_rows]}
+        for day, day_rows in groupby(rows, key=lambda row: row['due_date'])
+    ]
+
+
+def feed_token(user, regenerate=False):
+    """Podpisany identyfikator użytkownika z jego sekretem do adresu kanału .ics - klienci kalendarza nie mają sesji
+
+    Sekret powstaje przy pierwszym użyciu; regenerate losuje nowy, więc wcześniejszy adres przestaje działać.
+    """
+    profile, _ = Profile.objects.get_or_create(user=user)
+    if regenerate or not profile.feed_secret:
+        profile.feed_secret = secrets.token_urlsafe(24)
+        profile.save(update_fields=['feed_secret'])
+    return signing.Signer(salt=FEED_SALT).sign(f'{user.pk}:{profile.feed_secret}')
+
+
+def feed_user(token):
+    try:
+        user_id, _, secret = signing.Signer(salt=FEED_SALT).unsign(token).partition(':')
+    except signing.BadSignature:
+        return None
+    if not secret:
+        # token sprzed wprowadzenia sekretu - sam identyfikator nie dałoby się unieważnić
+        return None
+    return get_user_model().objects.filter(pk=user_id, is_active=True, profile__feed_secret=secret).first()
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Linia iCalendar złamana co 75 bajtów (RFC 5545, 3.1) - bez dzielenia znaków UTF-8"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _duration(delta):
+    minutes = int(delta.total_seconds() // 60)
+    sign = '-' if minutes > 0 else ''
+    days, minutes = divmod(abs(minutes), 24 * 60)
+    return f'{sign}P{days}DT{minutes // 60}H{minutes % 60}M'
+
+
+def ics_event(row, host, task_url):
+    # godzina 00:00 to domyślna wartość formularza - "bez godziny", czyli wydarzenie całodniowe
+    all_day = row['due_time'] == time_of_day(0)
+    due = datetime.combine(row['due_date'], row['due_time'])
+    lines = [
+        'BEGIN:VEVENT',
+        # każde wystąpienie serii to osobne wydarzenie
+        f'UID:task-{row["id"]}{row["due_date"]:-%Y%m%d}@{host}' if row['recurrence'] else f'UID:task-{row["id"]}@{host}',
+        f'DTSTAMP:{_utc(row["updated_at"])}',
+        f'DTSTART;VALUE=DATE:{row["due_date"]:%Y%m%d}' if all_day else f'DTSTART:{due:%Y%m%dT%H%M%S}',
+        f'SUMMARY:{"✓ " if row["is_completed"] else ""}{_escape(row["title"])}',
+        f'PRIORITY:{PRIORITIES.get(row["priority"], 0)}',
+        f'URL:{task_url(row["id"])}',
+    ]
+    if row['description']:
+        lines.append(f'DESCRIPTION:{_escape(row["description"])}')
+    if row['category_id']:
+        lines.append(f'CATEGORIES:{_escape(row["category__name"])}')
+    reminder = _reminder(row)
+    if reminder and not row['is_completed']:
+        # TRIGGER względem początku - czas "zegarowy" jak termin, niezależny od strefy klienta
+        lines += [
+            'BEGIN:VALARM', 'ACTION:DISPLAY', f'DESCRIPTION:{_escape(row["title"])}',
+            f'TRIGGER:{_duration(due - reminder)}', 'END:VALARM',
+        ]
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def iter_ics(rows, host, task_url, name='Zadania'):
+    """Kanał iCalendar generowany strumieniowo - godziny "pływające" (bez strefy), bo termin zadania to czas zegarowy"""
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//WebBlog//Zadania//PL', 'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH', f'X-WR-CALNAME:{_escape(name)}',
+    ])
+    for row in rows:
+        yield ics_event(row, host, task_url)
+    yield 'END:VCALENDAR\r\n'
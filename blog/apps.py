@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        if getattr(settings, 'PERFORMANCE_METRICS', False):
+            from . import metrics
+            metrics.install_query_timer()
+        if getattr(settings, 'QUERY_CHECK', False):
+            from . import querycheck
+            querycheck.install()
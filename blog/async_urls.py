@@ -0,0 +1,22 @@
+from django.urls import URLPattern
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+
+# pod ASGI widoki tylko do odczytu czekają na bazę w pętli zdarzeń zamiast zajmować wątek z puli;
+# formularze i operacje zapisu zostają synchroniczne
+ASYNC_VIEWS = {
+    'index': async_views.index,
+    'task-list': async_views.tasks,
+    'task-detail': async_views.task_detail,
+    'category-list': async_views.categories,
+    'api-tasks': async_views.task_list_api,
+    'api-categories': async_views.category_list_api,
+}
+
+urlpatterns = [
+    URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,171 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import APIException
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import ForcedAuthentication, Request
+
+from . import dashboard_cache, versions
+from .models import Task, Category
+from .pagination import TaskCursorPagination, apaginate_tasks
+from .querycheck import query_budget
+from .routers import replica_reads
+from .serializers import CategorySerializer, afast_task_data, task_values
+from .views import TASKS_PAGE_SIZE, CategoryListAPIView, TaskListAPIView, filtered_tasks, next_page_query
+
+
+async def auser(request):
+    """Zalogowany użytkownik wczytany z sesji w wątku ORM - Django 4.2 nie ma jeszcze request.auser()"""
+    user = await sync_to_async(get_user)(request)
+    request.user = user
+    return user
+
+
+def login_required(view):
+    """login_required dla widoków asynchronicznych - to samo przekierowanie co w django.contrib.auth"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await auser(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def conditional_get(request, respond):
+    """Dekorator condition() z versions.etag i versions.last_modified w wersji dla widoków asynchronicznych"""
+    await versions.acurrent(request)
+    etag = quote_etag(versions.etag(request))
+    last_modified = versions.last_modified(request)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await respond()
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers.setdefault('ETag', etag)
+    return response
+
+
+def json_list(api_view):
+    """Asynchroniczny GET listy w JSON dla użytkownika zalogowanego sesją
+
+    Pozostałe żądania (inne metody, Basic auth, brak logowania, Browsable API, błędy) obsługuje
+    w wątku widok DRF api_view, więc odpowiedzi nietypowe są dokładnie takie jak pod WSGI.
+    """
+    drf_view = sync_to_async(api_view.as_view())
+    renderers = [renderer() for renderer in api_view.renderer_classes]
+    allowed = api_view()
+    allowed.head = allowed.get  # tak jak View.setup() - HEAD obsługuje get
+    allow = ', '.join(allowed.allowed_methods)
+
+    def decorator(load):
+        @functools.wraps(load)
+        async def view(request):
+            if request.method not in ('GET', 'HEAD') or 'HTTP_AUTHORIZATION' in request.META:
+                return await drf_view(request)
+            user = await auser(request)
+            if not user.is_authenticated:
+                return await drf_view(request)
+            api_request = Request(request, authenticators=[ForcedAuthentication(user, None)])
+            try:
+                renderer, media_type = DefaultContentNegotiation().select_renderer(api_request, renderers)
+            except APIException:
+                return await drf_view(request)
+            if not isinstance(renderer, JSONRenderer):
+                return await drf_view(request)
+
+            async def respond():
+                response = HttpResponse(renderer.render(await load(api_request), media_type, {}), content_type=renderer.media_type)
+                response['Allow'] = allow
+                patch_vary_headers(response, ['Accept'])
+                return response
+
+            try:
+                return await conditional_get(request, respond)
+            except APIException:
+                return await drf_view(request)
+        return view
+    return decorator
+
+
+@replica_reads
+@query_budget(5)
+async def index(request):
+    user = await auser(request)
+    if user.is_authenticated:
+        tasks = await dashboard_cache.aget_fragment(
+            user, 'tasks', lambda: Task.objects.for_listing(user).filter(is_completed=False)[:5]
+        )
+        reminders = await dashboard_cache.aget_fragment(user, 'reminders', lambda: Task.objects.sent_reminders(user))
+    else:
+        tasks = []
+        reminders = []
+    context = {'tasks': tasks, 'reminders': reminders}
+    return render(request, 'index.html', context=context)
+
+
+@replica_reads
+@query_budget(5)
+@login_required
+async def tasks(request):
+    tasks, ordering, context = filtered_tasks(request)
+    try:
+        tasks, next_cursor = await apaginate_tasks(tasks, request.GET.get('cursor'), TASKS_PAGE_SIZE, ordering)
+    except ValueError:
+        raise Http404('Niepoprawny kursor')
+
+    categories = await dashboard_cache.aget_fragment(
+        request.user, 'categories', lambda: Category.objects.filter(author=request.user)
+    )
+    context.update({
+        'tasks': tasks,
+        'categories': categories,
+        'next_query': next_page_query(request, next_cursor),
+    })
+    return render(request, 'tasks/list.html', context=context)
+
+
+@replica_reads
+@query_budget(4)
+@login_required
+async def task_detail(request, task_id):
+    try:
+        task = await Task.objects.for_listing(request.user).aget(id=task_id)
+    except Task.DoesNotExist:
+        raise Http404('No Task matches the given query.')
+    context = {'task': task}
+    return render(request, 'tasks/detail.html', context)
+
+
+@replica_reads
+@query_budget(3)
+@login_required
+async def categories(request):
+    cats = Category.objects.filter(author=request.user).with_task_stats(request.user)
+    context = {'categories': [category async for category in cats.aiterator()]}
+    return render(request, 'tasks/categories.html', context)
+
+
+@replica_reads
+@query_budget(5)
+@json_list(TaskListAPIView)
+async def task_list_api(request):
+    paginator = TaskCursorPagination()
+    rows = await paginator.apaginate_queryset(task_values(Task.objects.filter(author=request.user)), request)
+    return paginator.get_paginated_response(await afast_task_data(rows)).data
+
+
+@replica_reads
+@query_budget(4)
+@json_list(CategoryListAPIView)
+async def category_list_api(request):
+    categories = Category.objects.filter(author=request.user)
+    return CategorySerializer([category async for category in categories.aiterator()], many=True).data
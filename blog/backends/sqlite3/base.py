@@ -0,0 +1,30 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite z ustawieniami PRAGMA z OPTIONS['pragmas'] na każdym nowym połączeniu i transakcjami BEGIN IMMEDIATE
+
+    Transakcja odroczona (BEGIN) czyta pod blokadą współdzieloną i dopiero przy zapisie próbuje zdobyć blokadę
+    zapisu - gdy dwie takie transakcje spotkają się naraz, SQLite od razu zgłasza "database is locked", bez czekania
+    busy_timeout. BEGIN IMMEDIATE bierze blokadę zapisu na starcie, więc współbieżne zapisy po prostu czekają w kolejce.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pragmas = {}
+        # ustawiane przez blog.transactions.immediate_atomic na czas rozpoczęcia najbardziej zewnętrznej transakcji
+        self.begin_immediate = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
@@ -0,0 +1,408 @@
+import contextlib
+import itertools
+import json
+import platform
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from WebBlogProject.databases import SQLITE_PRAGMAS
+
+from .metrics import RollingSummary
+from .models import Task, Category, Tag
+from .transactions import is_lock_error, retry_on_lock
+
+
+BenchRequest = namedtuple('BenchRequest', ['method', 'path', 'data', 'content_type'], defaults=(None, None))
+Scenario = namedtuple('Scenario', ['name', 'url_name', 'method', 'prepare'])
+# p95 musi wzrosnąć o tolerancję i jeszcze o NOISE_MS, żeby uznać to za regresję - szybkie widoki mierzone
+# w ułamkach milisekundy wahają się o więcej niż 25%
+NOISE_MS = 1.0
+SERVER_TIMING_QUERIES = re.compile(r'db;desc="(\d+) queries"')
+SCENARIOS = []
+
+
+class BenchmarkContext:
+    """Użytkownik i jego dane, na których działają scenariusze - unikalne nazwy dla formularzy tworzących obiekty"""
+
+    def __init__(self, user):
+        self.user = user
+        self.counter = itertools.count(1)
+        self.task = Task.objects.filter(author=user, is_completed=False).order_by('pk').first() or self.new_task()
+        self.category = Category.objects.filter(author=user).order_by('pk').first()
+        self.tag_ids = list(Tag.objects.filter(author=user).order_by('pk').values_list('pk', flat=True)[:2])
+
+    def unique(self, prefix):
+        return f'{prefix} {time.time_ns()}-{next(self.counter)}'
+
+    def new_task(self):
+        return Task.objects.create(author=self.user, title=self.unique('Benchmark'), due_date=date.today() + timedelta(days=7))
+
+    def new_series(self):
+        return Task.objects.create(
+            author=self.user, title=self.unique('Benchmark'), due_date=date.today() + timedelta(days=1), recurrence='FREQ=DAILY'
+        )
+
+    def color(self):
+        # kolor kategorii też musi być unikalny u użytkownika
+        return f'#{0x7f0000 + next(self.counter):06x}'
+
+    def new_category(self):
+        return Category.objects.create(author=self.user, name=self.unique('Kategoria')[:50], color=self.color())
+
+    def task_form(self):
+        return {
+            'title': self.unique('Zadanie z formularza'),
+            'description': 'Dane testu wydajności',
+            'category': self.category.pk if self.category else '',
+            'tags': self.tag_ids,
+            'due_date': (date.today() + timedelta(days=3)).isoformat(),
+            'due_time': '12:00',
+            'priority': 'medium',
+        }
+
+
+def scenario(url_name, method='GET', name=None):
+    """Rejestruje scenariusz - funkcja dostaje BenchmarkContext i zwraca BenchRequest (przygotowanie nie jest mierzone)"""
+    def decorator(prepare):
+        SCENARIOS.append(Scenario(name or (url_name if method == 'GET' else f'{url_name} {method}'), url_name, method, prepare))
+        return prepare
+    return decorator
+
+
+def get(url_name, query=''):
+    return lambda ctx: BenchRequest('GET', reverse(url_name) + query)
+
+
+def get_task(url_name, query=''):
+    return lambda ctx: BenchRequest('GET', reverse(url_name, args=[ctx.task.pk]) + query)
+
+
+def get_category(url_name):
+    return lambda ctx: BenchRequest('GET', reverse(url_name, args=[ctx.category.pk]))
+
+
+for url_name in (
+    'index', 'about', 'task-list', 'task-create', 'category-list', 'category-create',
+    'api-tasks', 'api-categories', 'api-category-stats', 'api-sync', 'api-cache-stats', 'metrics',
+):
+    scenario(url_name)(get(url_name))
+scenario('task-list', name='task-list ?query')(get('task-list', '?query=raport'))
+scenario('task-list', name='task-list ?filter=overdue')(get('task-list', '?filter=overdue'))
+scenario('task-export')(get('task-export', '?format=ndjson'))
+scenario('api-agenda')(get('api-agenda'))
+scenario('api-agenda-feed')(get('api-agenda-feed'))
+scenario('task-detail')(get_task('task-detail'))
+scenario('task-edit')(get_task('task-edit'))
+scenario('category-edit')(get_category('category-edit'))
+
+
+@scenario('api-agenda', name='api-agenda ?rok')
+def agenda_year(ctx):
+    today = date.today()
+    return BenchRequest('GET', f'{reverse("api-agenda")}?from={today}&to={today + timedelta(days=365)}')
+
+
+@scenario('task-create', 'POST')
+def create_task(ctx):
+    return BenchRequest('POST', reverse('task-create'), ctx.task_form())
+
+
+@scenario('task-edit', 'POST')
+def edit_task(ctx):
+    return BenchRequest('POST', reverse('task-edit', args=[ctx.new_task().pk]), ctx.task_form())
+
+
+@scenario('task-toggle', 'POST')
+def toggle_task(ctx):
+    return BenchRequest('POST', reverse('task-toggle', args=[ctx.new_task().pk]))
+
+
+@scenario('task-skip', 'POST')
+def skip_occurrence(ctx):
+    return BenchRequest('POST', reverse('task-skip', args=[ctx.new_series().pk]))
+
+
+@scenario('task-delete', 'POST')
+def delete_task(ctx):
+    return BenchRequest('POST', reverse('task-delete', args=[ctx.new_task().pk]))
+
+
+@scenario('category-create', 'POST')
+def create_category(ctx):
+    return BenchRequest('POST', reverse('category-create'), {'name': ctx.unique('Nowa')[:50], 'color': ctx.color()})
+
+
+@scenario('category-edit', 'POST')
+def edit_category(ctx):
+    category = ctx.new_category()
+    return BenchRequest('POST', reverse('category-edit', args=[category.pk]), {'name': ctx.unique('Zmiana')[:50], 'color': ctx.color()})
+
+
+@scenario('category-delete', 'POST')
+def delete_category(ctx):
+    return BenchRequest('POST', reverse('category-delete', args=[ctx.new_category().pk]))
+
+
+@scenario('api-tasks-bulk', 'POST')
+def bulk_tasks(ctx):
+    due_date = (date.today() + timedelta(days=5)).isoformat()
+    payload = {'create': [{'title': ctx.unique('Masowe'), 'due_date': due_date} for _ in range(20)]}
+    return BenchRequest('POST', reverse('api-tasks-bulk'), json.dumps(payload), 'application/json')
+
+
+@scenario('api-tasks-import', 'POST')
+def import_tasks(ctx):
+    due_date = (date.today() + timedelta(days=5)).isoformat()
+    lines = [json.dumps({'title': ctx.unique('Import'), 'due_date': due_date, 'tags': ['import']}) for _ in range(20)]
+    return BenchRequest('POST', reverse('api-tasks-import'), '\n'.join(lines) + '\n', 'application/x-ndjson')
+
+
+def percentiles(samples):
+    summary = RollingSummary(window=len(samples) or 1)
+    for sample in samples:
+        summary.add(sample)
+    return {
+        'p50_ms': round(summary.quantile(0.5) * 1000, 3),
+        'p95_ms': round(summary.quantile(0.95) * 1000, 3),
+        'p99_ms': round(summary.quantile(0.99) * 1000, 3),
+        'mean_ms': round(summary.sum / summary.count * 1000, 3),
+    }
+
+
+def _consume(response):
+    # odpowiedź strumieniowa (eksport) liczy się dopiero po wygenerowaniu całej treści
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+
+
+class ClientRunner:
+    """Żądania klientem testowym Django w tym samym procesie - liczba zapytań z CaptureQueriesContext
+
+    Wszystko (także sesja i zmiany ze scenariuszy POST) dzieje się w transakcji wycofywanej na końcu.
+    """
+
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, bench_request):
+        call = getattr(self.client, bench_request.method.lower())
+        kwargs = {'content_type': bench_request.content_type} if bench_request.content_type else {}
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = call(bench_request.path, bench_request.data, **kwargs)
+            _consume(response)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, len(queries)
+
+
+class ServerRunner:
+    """GET-y przez HTTP do działającego serwera (runserver, gunicorn, uvicorn) korzystającego z tej samej bazy
+
+    Liczba zapytań pochodzi z nagłówka Server-Timing (PerformanceMiddleware) - bez niego jest None.
+    """
+
+    def __init__(self, user, base_url):
+        client = Client()
+        client.force_login(user)
+        self.base_url = base_url.rstrip('/')
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def request(self, bench_request):
+        http_request = urllib.request.Request(self.base_url + bench_request.path, headers={'Cookie': self.cookie})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(http_request) as response:
+                response.read()
+                status, timing = response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status, timing = exc.code, exc.headers.get('Server-Timing', '')
+        elapsed = time.perf_counter() - started
+        match = SERVER_TIMING_QUERIES.search(timing)
+        return status, elapsed, int(match.group(1)) if match else None
+
+
+def measure(runner, ctx, bench_scenario, iterations, warmup):
+    samples, statuses, queries = [], set(), None
+    for iteration in range(warmup + iterations):
+        status, elapsed, count = runner.request(bench_scenario.prepare(ctx))
+        if iteration >= warmup:
+            samples.append(elapsed)
+            statuses.add(status)
+            queries = count if queries is None else max(queries, count or 0)
+    return {
+        'url_name': bench_scenario.url_name,
+        'method': bench_scenario.method,
+        'status': sorted(statuses),
+        'queries': queries,
+        **percentiles(samples),
+    }
+
+
+def run(user, iterations=20, warmup=2, server=None, only=None):
+    """Wyniki wszystkich scenariuszy (albo wybranych w only) dla użytkownika - słownik gotowy do zapisu w JSON
+
+    Bez server scenariusze idą przez klienta testowego w wycofywanej transakcji, więc baza zostaje
+    nietknięta; z server mierzone są tylko GET-y, bo zapisy zmieniałyby dane na serwerze.
+    """
+    scenarios = [s for s in SCENARIOS if not only or s.name in only or s.url_name in only]
+    if server:
+        scenarios = [s for s in scenarios if s.method == 'GET']
+    results = {}
+    # w trybie klienta wszystko (sesja, zmiany ze scenariuszy POST) jest wycofywane; sesja dla serwera musi przetrwać
+    with override_settings(
+        ALLOWED_HOSTS=['testserver'], QUERY_CHECK=False,
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    ), contextlib.nullcontext() if server else transaction.atomic():
+        if not server:
+            # /metrics i statystyki cache wymagają konta personelu - zmiana znika razem z transakcją
+            user.is_staff = True
+            user.save(update_fields=['is_staff'])
+        runner = ServerRunner(user, server) if server else ClientRunner(user)
+        ctx = BenchmarkContext(user)
+        for bench_scenario in scenarios:
+            results[bench_scenario.name] = measure(runner, ctx, bench_scenario, iterations, warmup)
+        if not server:
+            transaction.set_rollback(True)
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'mode': f'server {server}' if server else 'client',
+            'user': user.username,
+            'user_tasks': Task.objects.filter(author=user).count(),
+            'all_tasks': Task.objects.count(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'root_urlconf': settings.ROOT_URLCONF,
+        },
+        'scenarios': results,
+    }
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Regresje względem zapisanego wyniku - wolniejszy p95, więcej zapytań albo inny kod odpowiedzi"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        limit = previous['p95_ms'] * (1 + tolerance) + NOISE_MS
+        if current['p95_ms'] > limit:
+            regressions.append(f'{name}: p95 {current["p95_ms"]:.2f} ms > {limit:.2f} ms (było {previous["p95_ms"]:.2f} ms)')
+        if current['queries'] is not None and previous['queries'] is not None and current['queries'] > previous['queries']:
+            regressions.append(f'{name}: {current["queries"]} zapytań (było {previous["queries"]})')
+        if current['status'] != previous['status']:
+            regressions.append(f'{name}: status {current["status"]} (było {previous["status"]})')
+    return regressions
+
+
+CONTENTION_SCHEMA = [
+    'CREATE TABLE task (id INTEGER PRIMARY KEY, is_completed BOOLEAN NOT NULL, updated_at TEXT NOT NULL)',
+    'CREATE TABLE stats (user_id INTEGER PRIMARY KEY, completed INTEGER NOT NULL)',
+    'CREATE TABLE changelog (id INTEGER PRIMARY KEY AUTOINCREMENT, object_id INTEGER NOT NULL, created_at TEXT NOT NULL)',
+]
+# bez strojenia: ustawienia domyślne SQLite i modułu sqlite3 (timeout 5 s), transakcja odroczona jak w zwykłym atomic()
+UNTUNED_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+def _contention_connection(path, tuned):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    for name, value in (SQLITE_PRAGMAS if tuned else UNTUNED_PRAGMAS).items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+def _toggle(conn, tuned, task_id):
+    """Transakcja o kształcie toggle_task: odczyt zadania, zmiana zadania i licznika, wpis w dzienniku zmian"""
+    conn.execute('BEGIN IMMEDIATE' if tuned else 'BEGIN')
+    try:
+        (completed,) = conn.execute('SELECT is_completed FROM task WHERE id = ?', [task_id]).fetchone()
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        conn.execute('UPDATE task SET is_completed = ?, updated_at = ? WHERE id = ?', [not completed, now, task_id])
+        conn.execute('UPDATE stats SET completed = completed + ? WHERE user_id = 1', [-1 if completed else 1])
+        conn.execute('INSERT INTO changelog (object_id, created_at) VALUES (?, ?)', [task_id, now])
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def write_contention(threads=8, writes=50, tuned=True, tasks=100):
+    """Współbieżne zapisy w stylu toggle_task z wielu wątków na pliku SQLite - przepustowość i błędy blokady
+
+    Bez strojenia transakcja zaczyna się od BEGIN i nie jest powtarzana - tak kończyły się współbieżne POST-y
+    z formularzy AJAX; ze strojeniem działa jak write_transaction: SQLITE_PRAGMAS, BEGIN IMMEDIATE i retry_on_lock.
+    Baza testowa Django jest w pamięci, więc pomiar idzie na osobnym pliku tymczasowym i surowym sqlite3.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = f'{directory}/contention.sqlite3'
+        setup = _contention_connection(path, tuned)
+        for statement in CONTENTION_SCHEMA:
+            setup.execute(statement)
+        setup.executemany('INSERT INTO task VALUES (?, 0, ?)', [(pk, '') for pk in range(1, tasks + 1)])
+        setup.execute('INSERT INTO stats VALUES (1, 0)')
+        setup.close()
+
+        start = threading.Barrier(threads)
+        lock = threading.Lock()
+        samples, errors = [], []
+
+        def worker(number):
+            conn = _contention_connection(path, tuned)
+            start.wait()
+            for write in range(writes):
+                task_id = (number * writes + write) % tasks + 1
+                began = time.perf_counter()
+                try:
+                    if tuned:
+                        retry_on_lock(lambda: _toggle(conn, tuned, task_id), errors=(sqlite3.OperationalError,))
+                    else:
+                        _toggle(conn, tuned, task_id)
+                except sqlite3.OperationalError as exc:
+                    if not is_lock_error(exc):
+                        raise
+                    with lock:
+                        errors.append(exc)
+                    continue
+                with lock:
+                    samples.append(time.perf_counter() - began)
+            conn.close()
+
+        pool = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        check = sqlite3.connect(path)
+        logged = check.execute('SELECT COUNT(*) FROM changelog').fetchone()[0]
+        check.close()
+    return {
+        'mode': 'tuned' if tuned else 'untuned',
+        'threads': threads,
+        'committed': len(samples),
+        'locked': len(errors),
+        'logged': logged,
+        'writes_per_second': round(len(samples) / elapsed, 1),
+        **percentiles(samples),
+    }
@@ -0,0 +1,216 @@
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import signals, stats
+from .models import Task, TaskOccurrence, Category, Tag
+from .serializers import TaskWriteSerializer
+
+
+MAX_BULK_ITEMS = 1000
+OPERATIONS = ('create', 'update', 'complete', 'delete')
+
+
+def _ids(items, operation):
+    if not all(isinstance(item, int) and not isinstance(item, bool) for item in items):
+        raise ValidationError({operation: 'Oczekiwano listy identyfikatorów zadań.'})
+    return items
+
+
+class BulkTaskOperations:
+    """Masowe tworzenie, edycja, ukończenie i usuwanie zadań użytkownika w jednej transakcji
+
+    Najpierw sprawdzane są wszystkie pozycje (stała liczba zapytań), a zapis następuje tylko wtedy,
+    gdy żadna nie zawiera błędów - inaczej nic nie jest zmieniane.
+    """
+
+    def __init__(self, user, payload):
+        if not isinstance(payload, dict) or not set(payload) <= set(OPERATIONS):
+            raise ValidationError(f'Oczekiwano obiektu z kluczami: {", ".join(OPERATIONS)}.')
+        for operation in OPERATIONS:
+            if not isinstance(payload.get(operation, []), list):
+                raise ValidationError({operation: 'Oczekiwano listy.'})
+        if sum(len(payload.get(operation, [])) for operation in OPERATIONS) > MAX_BULK_ITEMS:
+            raise ValidationError(f'Maksymalnie {MAX_BULK_ITEMS} operacji w jednym żądaniu.')
+        self.user = user
+        self.create_items = payload.get('create', [])
+        self.update_items = payload.get('update', [])
+        self.complete_ids = _ids(payload.get('complete', []), 'complete')
+        self.delete_ids = _ids(payload.get('delete', []), 'delete')
+        self.results = {operation: [] for operation in OPERATIONS if operation in payload}
+        self.valid = True
+
+    def _fail(self, operation, errors, **extra):
+        self.valid = False
+        self.results[operation].append({'status': 'invalid', 'errors': errors, **extra})
+
+    def _load(self):
+        update_ids = [item.get('id') for item in self.update_items if isinstance(item, dict)]
+        self.tasks = Task.objects.filter(author=self.user).in_bulk(
+            [pk for pk in update_ids if isinstance(pk, int)]
+        ) if update_ids else {}
+        target_ids = self.complete_ids + self.delete_ids
+        self.existing_ids = set(
+            Task.objects.filter(author=self.user, id__in=target_ids).values_list('id', flat=True)
+        ) if target_ids else set()
+        self.category_ids = set(Category.objects.filter(author=self.user).values_list('id', flat=True))
+        self.tag_ids = set(Tag.objects.filter(author=self.user).values_list('id', flat=True))
+        titles = [
+            item['title'].lower() for item in self.create_items + self.update_items
+            if isinstance(item, dict) and isinstance(item.get('title'), str)
+        ]
+        self.titles = dict(
+            Task.objects.filter(author=self.user).annotate(lower_title=Lower('title'))
+            .filter(lower_title__in=titles).values_list('lower_title', 'id')
+        ) if titles else {}
+
+    def _check_relations(self, data, errors):
+        if data.get('category') is not None and data['category'] not in self.category_ids:
+            errors['category'] = ['Nieznana kategoria.']
+        if any(tag_id not in self.tag_ids for tag_id in data.get('tags', [])):
+            errors['tags'] = ['Nieznany tag.']
+
+    def _check_title(self, data, errors, task_id=None):
+        title = data.get('title')
+        if title is None:
+            return
+        owner = self.titles.get(title.lower())
+        if owner is not None and owner != task_id:
+            errors['title'] = ['Zadanie o tej nazwie już istnieje.']
+        else:
+            # kolejne pozycje z tą samą nazwą w tym samym żądaniu też są duplikatami
+            self.titles[title.lower()] = task_id or object()
+
+    def _check_due_date(self, data, errors):
+        if 'due_date' in data and data['due_date'] < timezone.localdate():
+            errors['due_date'] = ['Termin nie może być w przeszłości.']
+
+    def validate(self):
+        self._load()
+        self.to_create = []
+        for item in self.create_items:
+            serializer = TaskWriteSerializer(data=item)
+            errors = {} if serializer.is_valid() else dict(serializer.errors)
+            data = serializer.validated_data if not errors else {}
+            if data:
+                self._check_relations(data, errors)
+                self._check_title(data, errors)
+                self._check_due_date(data, errors)
+            if errors:
+                self._fail('create', errors)
+            else:
+                self.to_create.append(data)
+                self.results['create'].append({'status': 'created'})
+
+        self.to_update = []
+        for item in self.update_items:
+            task_id = item.get('id') if isinstance(item, dict) else None
+            task = self.tasks.get(task_id) if isinstance(task_id, int) else None
+            if task is None:
+                self._fail('update', {'id': ['Nie znaleziono zadania.']}, id=task_id)
+                continue
+            serializer = TaskWriteSerializer(task, data={k: v for k, v in item.items() if k != 'id'}, partial=True)
+            errors = {} if serializer.is_valid() else dict(serializer.errors)
+            if not errors:
+                self._check_relations(serializer.validated_data, errors)
+                self._check_title(serializer.validated_data, errors, task.pk)
+                self._check_due_date(serializer.validated_data, errors)
+            if errors:
+                self._fail('update', errors, id=task.pk)
+            else:
+                self.to_update.append((task, serializer.validated_data))
+                self.results['update'].append({'id': task.pk, 'status': 'updated'})
+
+        for operation, ids, status in (
+            ('complete', self.complete_ids, 'completed'),
+            ('delete', self.delete_ids, 'deleted'),
+        ):
+            for task_id in ids:
+                if task_id in self.existing_ids:
+                    self.results[operation].append({'id': task_id, 'status': status})
+                else:
+                    self._fail(operation, {'id': ['Nie znaleziono zadania.']}, id=task_id)
+        return self.valid
+
+    def _set_tags(self, tag_map):
+        through = Task.tags.through
+        through.objects.filter(task_id__in=list(tag_map)).delete()
+        through.objects.bulk_create(
+            [
+                through(task_id=task_id, tag_id=tag_id)
+                for task_id, tag_ids in tag_map.items() for tag_id in set(tag_ids)
+            ]
+        )
+
+    def _complete_occurrences(self, series):
+        """Task.complete_occurrence dla wielu zadań cyklicznych naraz - stała liczba zapytań"""
+        TaskOccurrence.objects.bulk_create(
+            [TaskOccurrence(task=task, author_id=task.author_id, date=task.due_date) for task in series]
+        )
+        now = timezone.now()
+        for task in series:
+            task.advance_occurrence()
+            task.updated_at = now
+        Task.objects.bulk_update(series, ['due_date', 'reminder_date', 'reminder_sent_at', 'is_completed', 'updated_at'])
+
+    def execute(self):
+        """Zapisuje wszystkie zmiany - wymaga wcześniejszego, udanego validate()"""
+        with transaction.atomic(), signals.suspended():
+            before = stats.states([task.pk for task, _ in self.to_update] + self.complete_ids + self.delete_ids, lock=True)
+            tasks = Task.objects.bulk_create([
+                Task(
+                    author=self.user,
+                    category_id=data.get('category'),
+                    **{field: value for field, value in data.items() if field not in ('category', 'tags')}
+                )
+                for data in self.to_create
+            ])
+            for task, result in zip(tasks, self.results.get('create', [])):
+                result['id'] = task.pk
+            tag_map = {task.pk: data['tags'] for task, data in zip(tasks, self.to_create) if data.get('tags')}
+
+            fields = set()
+            for task, data in self.to_update:
+                for field, value in data.items():
+                    if field == 'tags':
+                        tag_map[task.pk] = value
+                    elif field == 'category':
+                        task.category_id = value
+                        fields.add('category')
+                    else:
+                        setattr(task, field, value)
+                        fields.add(field)
+                    if field in ('reminder_date', 'reminder_time'):
+                        task.reminder_sent_at = None
+                        fields.add('reminder_sent_at')
+            if self.to_update:
+                # bulk_update nie wywołuje pre_save, więc auto_now trzeba ustawić samemu
+                now = timezone.now()
+                for task, _ in self.to_update:
+                    task.updated_at = now
+                Task.objects.bulk_update([task for task, _ in self.to_update], sorted(fields | {'updated_at'}))
+            if tag_map:
+                self._set_tags(tag_map)
+
+            if self.complete_ids:
+                # w serii kończy się tylko bieżące wystąpienie - jak przy przełączeniu pojedynczego zadania
+                series = list(
+                    Task.objects.filter(author=self.user, id__in=self.complete_ids, is_completed=False)
+                    .exclude(recurrence='')
+                )
+                if series:
+                    self._complete_occurrences(series)
+                Task.objects.filter(author=self.user, id__in=self.complete_ids).exclude(
+                    pk__in=[task.pk for task in series]
+                ).update(is_completed=True, updated_at=timezone.now())
+            if self.delete_ids:
+                Task.objects.filter(author=self.user, id__in=self.delete_ids).delete()
+
+            signals.sync_tasks(
+                self.user.pk,
+                changed_ids=[task.pk for task in tasks] + [task.pk for task, _ in self.to_update] + self.complete_ids,
+                removed_ids=self.delete_ids,
+                before=before,
+            )
+        return self.results
@@ -0,0 +1,86 @@
+import base64
+import binascii
+
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models import Max
+
+from .models import ChangeLogEntry, Task, Category, Tag
+
+
+SYNC_PAGE_SIZE = 1000
+MODELS = {
+    ChangeLogEntry.TASK: Task,
+    ChangeLogEntry.CATEGORY: Category,
+    ChangeLogEntry.TAG: Tag,
+}
+
+
+def lock_users(user_ids):
+    """Blokuje wiersze użytkowników do końca transakcji, zanim dostaną nowe wpisy dziennika - wymaga transakcji
+
+    Id wpisu jest nadawane przy INSERT, a transakcje mogą kończyć się w innej kolejności (PostgreSQL) - klient, który
+    dostałby token N+1 przed zatwierdzeniem wpisu N, pominąłby go na zawsze. Z blokadą wpisy jednego użytkownika
+    są zatwierdzane w kolejności id. SQLite i tak ma jednego piszącego naraz, więc zapytania tam nie ma.
+    """
+    if not transaction.get_connection(router.db_for_write(ChangeLogEntry)).features.has_select_for_update:
+        return
+    # FOR NO KEY UPDATE - nie wstrzymuje wstawiania innych wierszy z kluczem obcym do użytkownika
+    list(User.objects.select_for_update(no_key=True).filter(pk__in=user_ids).order_by('pk').values_list('pk'))
+
+
+def record(user_id, kind, object_ids, deleted=False):
+    """Zapisuje zmianę (albo nagrobek) obiektów użytkownika jednym bulk_create"""
+    object_ids = list(object_ids)
+    if user_id is None or not object_ids:
+        return
+    with transaction.atomic(router.db_for_write(ChangeLogEntry), savepoint=False):
+        lock_users([user_id])
+        ChangeLogEntry.objects.bulk_create([
+            ChangeLogEntry(user_id=user_id, kind=kind, object_id=object_id, deleted=deleted)
+            for object_id in dict.fromkeys(object_ids)
+        ])
+
+
+def encode_token(change_id):
+    return base64.urlsafe_b64encode(f'v1:{change_id}'.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Id ostatniej znanej klientowi zmiany - ValueError dla tokenów niepoprawnych"""
+    try:
+        version, change_id = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().split(':')
+        change_id = int(change_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError('Niepoprawny token synchronizacji') from exc
+    if version != 'v1' or change_id < 0:
+        raise ValueError('Niepoprawny token synchronizacji')
+    return change_id
+
+
+def latest_change_id(user):
+    return ChangeLogEntry.objects.filter(user=user).aggregate(last=Max('id'))['last'] or 0
+
+
+def changes_since(user, change_id, limit=None):
+    """Zmienione obiekty i nagrobki od podanej zmiany - (id obiektów, id usuniętych, id ostatniej zmiany, czy są kolejne)
+
+    Kilka zmian tego samego obiektu liczy się raz, a decyduje ostatnia z nich. Wpisy użytkownika są zatwierdzane
+    w kolejności id (lock_users), więc za tokenem nie pojawi się później wpis o mniejszym id.
+    """
+    limit = limit or SYNC_PAGE_SIZE
+    entries = list(
+        ChangeLogEntry.objects.filter(user=user, id__gt=change_id).order_by('id')
+        .values_list('id', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    state = {}
+    for _, kind, object_id, deleted in entries:
+        state[kind, object_id] = deleted
+    changed = {kind: [] for kind in MODELS}
+    removed = {kind: [] for kind in MODELS}
+    for (kind, object_id), deleted in state.items():
+        (removed if deleted else changed)[kind].append(object_id)
+    last = entries[-1][0] if entries else change_id
+    return changed, removed, last, has_more
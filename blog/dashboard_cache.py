@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import primary_reads
+
+
+FRAGMENTS = ('tasks', 'reminders', 'categories')
+STATS_PREFIX = 'dashboard-stats'
+_MISSING = object()
+
+
+def fragment_key(user_id, fragment):
+    return f'dashboard:{user_id}:{fragment}'
+
+
+def _count(fragment, outcome):
+    # liczniki trzymane w samym cache, więc są wspólne dla wszystkich procesów (np. przy FileBasedCache)
+    key = f'{STATS_PREFIX}:{fragment}:{outcome}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_fragment(user, fragment, build):
+    """Zwraca fragment z cache albo wylicza go funkcją build (lista obiektów) i zapamiętuje
+
+    Fragment jest zawsze liczony z bazy głównej - opóźniona replika zostawiłaby w cache stare dane na cały timeout.
+    """
+    key = fragment_key(user.pk, fragment)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        _count(fragment, 'misses')
+        with primary_reads():
+            value = list(build())
+        cache.set(key, value, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    else:
+        _count(fragment, 'hits')
+    return value
+
+
+async def _acount(fragment, outcome):
+    key = f'{STATS_PREFIX}:{fragment}:{outcome}'
+    if not await cache.aadd(key, 1, timeout=None):
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            await cache.aset(key, 1, timeout=None)
+
+
+async def aget_fragment(user, fragment, build):
+    """get_fragment dla widoków asynchronicznych - build zwraca QuerySet czytany przez async for"""
+    key = fragment_key(user.pk, fragment)
+    value = await cache.aget(key, _MISSING)
+    if value is _MISSING:
+        await _acount(fragment, 'misses')
+        with primary_reads():
+            value = [obj async for obj in build()]
+        await cache.aset(key, value, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    else:
+        await _acount(fragment, 'hits')
+    return value
+
+
+def invalidate(user_id, *fragments):
+    """Usuwa wskazane fragmenty użytkownika (domyślnie wszystkie)"""
+    if user_id is None:
+        return
+    cache.delete_many([fragment_key(user_id, fragment) for fragment in fragments or FRAGMENTS])
+
+
+def stats():
+    """Liczniki trafień i chybień dla każdego fragmentu"""
+    keys = [f'{STATS_PREFIX}:{fragment}:{outcome}' for fragment in FRAGMENTS for outcome in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    result = {}
+    for fragment in FRAGMENTS:
+        hits = values.get(f'{STATS_PREFIX}:{fragment}:hits', 0)
+        misses = values.get(f'{STATS_PREFIX}:{fragment}:misses', 0)
+        total = hits + misses
+        result[fragment] = {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else None}
+    return result
+
+
+def reset_stats():
+    cache.delete_many([f'{STATS_PREFIX}:{fragment}:{outcome}' for fragment in FRAGMENTS for outcome in ('hits', 'misses')])
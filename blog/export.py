@@ -0,0 +1,71 @@
+import csv
+import json
+
+from .models import Task
+
+
+CSV_FIELDS = [
+    'id', 'title', 'description', 'due_date', 'due_time', 'reminder_date', 'reminder_time',
+    'priority', 'is_completed', 'created_date', 'category', 'category_color', 'tags'
+]
+# nazwy tagów w jednej kolumnie CSV
+TAG_SEPARATOR = '|'
+CHUNK_SIZE = 2000
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def export_queryset(user):
+    """Zadania użytkownika czytane porcjami - w pamięci jest najwyżej CHUNK_SIZE zadań naraz"""
+    return Task.objects.for_listing(user).order_by('id').iterator(chunk_size=CHUNK_SIZE)
+
+
+def task_record(task):
+    """Zadanie z zagnieżdżoną kategorią i tagami, w kształcie odpowiedzi API"""
+    category = task.category
+    return {
+        'id': task.id,
+        'title': task.title,
+        'description': task.description,
+        'due_date': _iso(task.due_date),
+        'due_time': _iso(task.due_time),
+        'reminder_date': _iso(task.reminder_date),
+        'reminder_time': _iso(task.reminder_time),
+        'priority': task.priority,
+        'is_completed': task.is_completed,
+        'created_date': _iso(task.created_date),
+        'category': {'id': category.id, 'name': category.name, 'color': category.color} if category else None,
+        'tags': [{'id': tag.id, 'name': tag.name} for tag in task.tags.all()],
+    }
+
+
+class _Echo:
+    """Pseudo-plik dla csv.writer - zwraca zapisany wiersz zamiast go buforować"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(tasks):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for task in tasks:
+        record = task_record(task)
+        category = record.pop('category')
+        record['category'] = category['name'] if category else ''
+        record['category_color'] = category['color'] if category else ''
+        record['tags'] = TAG_SEPARATOR.join(tag['name'] for tag in record['tags'])
+        yield writer.writerow(['' if record[field] is None else record[field] for field in CSV_FIELDS])
+
+
+def iter_ndjson(tasks):
+    for task in tasks:
+        yield json.dumps(task_record(task), ensure_ascii=False) + '\n'
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
@@ -1,10 +1,13 @@
 from django.core.exceptions import ValidationError
 from django import forms
 from django.core.validators import MinLengthValidator
+from django.db import transaction
 from django.utils import timezone
 from datetime import date
 
-from .models import Task, Category, Tag
+from accounts.models import Profile
+from . import changelog, recurrence
+from .models import ChangeLogEntry, Task, Category, Tag
 
 
 DEFAULT_TAGS = [
@@ -14,11 +17,43 @@ DEFAULT_TAGS = [
 ]
 
 
+def provision_default_tags(users):
+    """Tworzy domyślne tagi dla podanych użytkowników jednym bulk_create i oznacza ich jako obsłużonych"""
+    users = list(users)
+    if not users:
+        return
+    existing = set(Tag.objects.filter(author__in=users, name__in=DEFAULT_TAGS).values_list('author_id', 'name'))
+    missing = {(user.pk, tag_name) for user in users for tag_name in DEFAULT_TAGS} - existing
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(name=tag_name, author_id=author_id) for author_id, tag_name in sorted(missing)],
+            ignore_conflicts=True,
+        )
+        # bulk_create nie wysyła sygnałów - nowe tagi trafiają do dziennika zmian (/api/sync/) jednym zapisem
+        author_ids = sorted({author_id for author_id, _ in missing})
+        with transaction.atomic(savepoint=False):
+            changelog.lock_users(author_ids)
+            ChangeLogEntry.objects.bulk_create([
+                ChangeLogEntry(user_id=author_id, kind=ChangeLogEntry.TAG, object_id=tag_id)
+                for author_id, tag_name, tag_id in Tag.objects.filter(
+                    author__in=author_ids, name__in=DEFAULT_TAGS,
+                ).values_list('author_id', 'name', 'id')
+                if (author_id, tag_name) in missing
+            ])
+    Profile.objects.bulk_create([Profile(user=user) for user in users], ignore_conflicts=True)
+    Profile.objects.filter(user__in=users).update(default_tags_provisioned=True)
+    for user in users:
+        user._default_tags_provisioned = True
+
+
 def ensure_default_tags(user):
-    """Tworzy domyślne tagi dla użytkownika jeśli nie istnieją"""
-    if user:
-        for tag_name in DEFAULT_TAGS:
-            Tag.objects.get_or_create(name=tag_name, author=user)
+    """Tworzy domyślne tagi dla użytkownika, jeśli jeszcze tego nie zrobiono (znacznik w profilu)"""
+    if not user or getattr(user, '_default_tags_provisioned', False):
+        return
+    if Profile.objects.filter(user=user, default_tags_provisioned=True).exists():
+        user._default_tags_provisioned = True
+        return
+    provision_default_tags([user])
 
 
 class TaskForm(forms.ModelForm):
@@ -48,10 +83,19 @@ class TaskForm(forms.ModelForm):
         required=False,
         widget=forms.TimeInput(attrs={'type': 'time'})
     )
+    recurrence = forms.CharField(
+        required=False,
+        max_length=100,
+        label='Powtarzanie',
+        widget=forms.Select(choices=recurrence.PRESETS, attrs={'class': 'form-select'})
+    )
 
     class Meta:
         model = Task
-        fields = ['title', 'description', 'category', 'tags', 'due_date', 'due_time', 'reminder_date', 'reminder_time', 'priority']
+        fields = [
+            'title', 'description', 'category', 'tags', 'due_date', 'due_time', 'reminder_date', 'reminder_time',
+            'priority', 'recurrence',
+        ]
         widgets = {
             'title': forms.TextInput(attrs={
                 'placeholder': 'Nazwa zadania',
@@ -87,6 +131,16 @@ class TaskForm(forms.ModelForm):
         self.fields['tags'].required = False
         if not self.instance.pk:
             self.fields['due_time'].initial = '00:00'
+        if self.instance.recurrence not in dict(recurrence.PRESETS):
+            # reguła spoza gotowych (np. z API) zostaje do wyboru, żeby edycja jej nie zgubiła
+            rule = self.instance.recurrence
+            self.fields['recurrence'].widget.choices = recurrence.PRESETS + [(rule, rule)]
+
+    def save(self, commit=True):
+        if self.instance.pk and {'reminder_date', 'reminder_time'} & set(self.changed_data):
+            # nowy termin przypomnienia - run_reminder_worker wyśle je jeszcze raz
+            self.instance.reminder_sent_at = None
+        return super().save(commit)
 
     def clean_title(self):
         title = self.cleaned_data.get('title')
@@ -130,6 +184,13 @@ class TaskForm(forms.ModelForm):
         if reminder_date and due_date:
             if reminder_date > due_date:
                 raise ValidationError('Przypomnienie musi być przed terminem wykonania.')
+        rule = cleaned_data.get('recurrence')
+        if rule and due_date:
+            try:
+                # termin serii to zawsze jej wystąpienie - pierwsze od podanej daty
+                cleaned_data['recurrence'], cleaned_data['due_date'] = recurrence.normalize(rule, due_date)
+            except ValueError as exc:
+                self.add_error('recurrence', str(exc))
         return cleaned_data
 
 
@@ -0,0 +1,216 @@
+import csv
+import json
+import time
+from datetime import date, time as time_of_day
+from itertools import islice
+
+from django.db import transaction
+
+from . import changelog, signals
+from .export import TAG_SEPARATOR
+from .models import Task, Category, CategoryStats, Tag
+
+
+CHUNK_SIZE = 2000
+# lista błędów w raporcie jest ograniczona, żeby plik z milionem złych wierszy nie zapełnił pamięci
+MAX_REPORTED_ERRORS = 100
+PRIORITIES = {value for value, _ in Task.PRIORITY_CHOICES}
+TRUE_VALUES = {'1', 'true', 'tak', 'yes'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_csv(lines):
+    """Wiersze CSV w układzie eksportu - kategoria jako nazwa i kolor, tagi rozdzielone TAG_SEPARATOR"""
+    for row in csv.DictReader(lines):
+        row['category'] = {'name': row.get('category'), 'color': row.pop('category_color', None)}
+        row['tags'] = (row.get('tags') or '').split(TAG_SEPARATOR)
+        yield row
+
+
+def read_ndjson(lines):
+    """Obiekty JSON, po jednym w wierszu - kategoria i tagi jako obiekty (jak w eksporcie) albo same nazwy"""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {'_error': 'Niepoprawny obiekt JSON.'}
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+}
+
+
+def _label(value, max_length):
+    name = value.get('name') if isinstance(value, dict) else value
+    if name is None:
+        return None
+    if not isinstance(name, str):
+        raise RowError('Nazwa kategorii i tagu musi być tekstem.')
+    name = name.strip()
+    if len(name) > max_length:
+        raise RowError(f'Nazwa "{name[:20]}..." jest dłuższa niż {max_length} znaków.')
+    return name or None
+
+
+def _parse(value, parse, field, required=False):
+    if value in (None, ''):
+        if required:
+            raise RowError(f'Pole {field} jest wymagane.')
+        return None
+    try:
+        return parse(value)
+    except (TypeError, ValueError):
+        raise RowError(f'Niepoprawna wartość pola {field}.')
+
+
+def clean_row(row):
+    """Sprawdza wiersz tymi samymi regułami co TaskWriteSerializer, ale bez kosztu serializera DRF"""
+    if '_error' in row:
+        raise RowError(row['_error'])
+    title = row.get('title')
+    if not isinstance(title, str) or len(title.strip()) < 3:
+        raise RowError('Nazwa musi mieć minimum 3 znaki.')
+    title = title.strip()
+    if len(title) > Task._meta.get_field('title').max_length:
+        raise RowError('Nazwa zadania jest za długa.')
+    priority = row.get('priority') or 'medium'
+    # wartości spoza JSON-owych napisów (listy, obiekty) nie mogą trafić do zbiorów i słowników
+    if not isinstance(priority, str) or priority not in PRIORITIES:
+        raise RowError('Nieznany priorytet.')
+    description = row.get('description') or ''
+    if not isinstance(description, str):
+        raise RowError('Niepoprawna wartość pola description.')
+    completed = row.get('is_completed')
+    if isinstance(completed, str):
+        completed = completed.strip().lower() in TRUE_VALUES
+    elif not isinstance(completed, (bool, int, type(None))):
+        raise RowError('Niepoprawna wartość pola is_completed.')
+    data = {
+        'title': title,
+        'description': description,
+        'due_date': _parse(row.get('due_date'), date.fromisoformat, 'due_date', required=True),
+        'due_time': _parse(row.get('due_time'), time_of_day.fromisoformat, 'due_time') or time_of_day(0, 0),
+        'reminder_date': _parse(row.get('reminder_date'), date.fromisoformat, 'reminder_date'),
+        'reminder_time': _parse(row.get('reminder_time'), time_of_day.fromisoformat, 'reminder_time'),
+        'priority': priority,
+        'is_completed': bool(completed),
+    }
+    if bool(data['reminder_date']) != bool(data['reminder_time']):
+        raise RowError('Podaj datę i godzinę przypomnienia.')
+    if data['reminder_date'] and data['reminder_date'] > data['due_date']:
+        raise RowError('Przypomnienie musi być przed terminem wykonania.')
+
+    category = row.get('category')
+    tags = row.get('tags') or []
+    if not isinstance(tags, list):
+        raise RowError('Tagi muszą być listą.')
+    color = category.get('color') if isinstance(category, dict) else None
+    if color is not None and (not isinstance(color, str) or len(color) > Category._meta.get_field('color').max_length):
+        raise RowError('Niepoprawny kolor kategorii.')
+    category = _label(category, Category._meta.get_field('name').max_length)
+    tags = [name for name in (_label(tag, Tag._meta.get_field('name').max_length) for tag in tags) if name]
+    return data, category, color or None, list(dict.fromkeys(tags))
+
+
+class TaskImporter:
+    """Import zadań użytkownika porcjami: stała liczba zapytań na porcję, w pamięci tylko porcja i nazwy zadań
+
+    Kategorie i tagi są rozwiązywane (i w razie potrzeby tworzone) kilkoma zapytaniami na porcję,
+    a duplikaty nazw zadań wykrywa zbiór nazw użytkownika trzymany w pamięci. Każda porcja zapisuje się
+    we własnej transakcji (w widoku API - w punkcie zapisu transakcji żądania), więc błędny wiersz odrzuca tylko siebie.
+    """
+
+    def __init__(self, user, chunk_size=CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.titles = None
+        self.categories = {}
+        self.tags = {}
+        self.report = {'imported': 0, 'skipped': 0, 'errors': []}
+
+    def _error(self, number, message):
+        self.report['skipped'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'row': number, 'error': message})
+
+    def _resolve(self, model, cache, wanted, defaults=None):
+        """Id etykiet po nazwie - brakujące są tworzone jednym bulk_create, a potem doczytywane"""
+        missing = [name for name in wanted if name not in cache]
+        if not missing:
+            return
+        existing = model.objects.filter(author=self.user, name__in=missing).values_list('name', 'id')
+        cache.update(existing)
+        missing = [name for name in missing if name not in cache]
+        if missing:
+            model.objects.bulk_create(
+                [model(author=self.user, name=name, **(defaults or {}).get(name, {})) for name in missing],
+                ignore_conflicts=True,
+            )
+            created = dict(model.objects.filter(author=self.user, name__in=missing).values_list('name', 'id'))
+            cache.update(created)
+            if model is Category:
+                # bulk_create nie wysyła post_save, który zakłada liczniki nowej kategorii
+                CategoryStats.objects.bulk_create([CategoryStats(category_id=pk) for pk in created.values()], ignore_conflicts=True)
+            changelog.record(self.user.pk, model._meta.model_name, created.values())
+
+    def _write(self, rows):
+        colors = {category: {'color': color} for _, category, color, _ in rows if category and color}
+        self._resolve(Category, self.categories, {category for _, category, _, _ in rows if category}, colors)
+        self._resolve(Tag, self.tags, {tag for _, _, _, tags in rows for tag in tags})
+        tasks = Task.objects.bulk_create([
+            Task(author=self.user, category_id=self.categories.get(category), **data)
+            for data, category, _, _ in rows
+        ])
+        through = Task.tags.through
+        through.objects.bulk_create([
+            through(task_id=task.pk, tag_id=self.tags[tag])
+            for task, (_, _, _, tags) in zip(tasks, rows) for tag in tags
+        ])
+        return [task.pk for task in tasks]
+
+    def import_rows(self, rows):
+        """Importuje wiersze (słowniki z READERS) i zwraca raport z liczbą wierszy na sekundę"""
+        started = time.perf_counter()
+        if self.titles is None:
+            self.titles = {
+                title.lower() for title in
+                Task.objects.filter(author=self.user).values_list('title', flat=True).iterator(chunk_size=self.chunk_size)
+            }
+        rows = enumerate(rows, 1)
+        while chunk := list(islice(rows, self.chunk_size)):
+            valid = []
+            for number, row in chunk:
+                try:
+                    cleaned = clean_row(row)
+                except RowError as error:
+                    self._error(number, str(error))
+                    continue
+                key = cleaned[0]['title'].lower()
+                if key in self.titles:
+                    self._error(number, 'Zadanie o tej nazwie już istnieje.')
+                    continue
+                self.titles.add(key)
+                valid.append(cleaned)
+            if not valid:
+                continue
+            with transaction.atomic(), signals.suspended():
+                task_ids = self._write(valid)
+                signals.sync_tasks(self.user.pk, changed_ids=task_ids, before={})
+            self.report['imported'] += len(task_ids)
+        elapsed = time.perf_counter() - started
+        processed = self.report['imported'] + self.report['skipped']
+        self.report['seconds'] = round(elapsed, 3)
+        self.report['rows_per_second'] = round(processed / elapsed) if elapsed else None
+        return self.report
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import export
+
+
+class Command(BaseCommand):
+    help = 'Eksportuje zadania użytkownika strumieniowo do CSV albo NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Nazwa użytkownika')
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='csv')
+        parser.add_argument('--output', help='Plik wynikowy (domyślnie standardowe wyjście)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Użytkownik "{options["username"]}" nie istnieje.')
+        generate, _ = export.FORMATS[options['format']]
+        rows = generate(export.export_queryset(user))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(rows)
+        else:
+            for row in rows:
+                self.stdout.write(row, ending='')
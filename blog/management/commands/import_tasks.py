@@ -0,0 +1,41 @@
+import os
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import importer
+
+
+class Command(BaseCommand):
+    help = 'Importuje strumieniowo zadania użytkownika z pliku CSV albo NDJSON (układ jak w export_tasks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Nazwa użytkownika')
+        parser.add_argument('path', help='Plik z zadaniami albo "-" dla standardowego wejścia')
+        parser.add_argument('--format', choices=sorted(importer.READERS), help='Domyślnie według rozszerzenia pliku')
+        parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE, help='Liczba wierszy w jednej porcji')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Użytkownik "{options["username"]}" nie istnieje.')
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in importer.READERS:
+            raise CommandError('Podaj --format (csv albo ndjson).')
+
+        task_importer = importer.TaskImporter(user, chunk_size=options['chunk_size'])
+        if path == '-':
+            report = task_importer.import_rows(importer.READERS[fmt](sys.stdin))
+        else:
+            with open(path, encoding='utf-8-sig', newline='') as source:
+                report = task_importer.import_rows(importer.READERS[fmt](source))
+
+        for error in report['errors']:
+            self.stderr.write(f'wiersz {error["row"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Zaimportowano {report["imported"]} zadań, pominięto {report["skipped"]} '
+            f'w {report["seconds"]:.1f}s ({report["rows_per_second"] or 0} wierszy/s).'
+        ))
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.forms import provision_default_tags
+
+
+class Command(BaseCommand):
+    help = 'Tworzy domyślne tagi dla istniejących użytkowników, którzy jeszcze ich nie mają'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Liczba użytkowników w jednej paczce')
+
+    def handle(self, *args, **options):
+        pending = User.objects.exclude(profile__default_tags_provisioned=True).order_by('pk')
+        batch_size = options['batch_size']
+        total, last_pk = 0, 0
+        while True:
+            users = list(pending.filter(pk__gt=last_pk)[:batch_size])
+            if not users:
+                break
+            with transaction.atomic():
+                provision_default_tags(users)
+            total += len(users)
+            last_pk = users[-1].pk
+        self.stdout.write(self.style.SUCCESS(f'Utworzono domyślne tagi dla {total} użytkowników.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from blog.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Przebudowuje indeks pełnotekstowy zadań od zera'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Alias bazy danych')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        backend = get_backend(connection)
+        with transaction.atomic(using=options['database']):
+            backend.install()
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Przebudowano indeks wyszukiwania ({type(backend).__name__}).'))
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog import stats
+
+
+class Command(BaseCommand):
+    help = 'Porównuje liczniki zadań (TaskStats, CategoryStats) z tabelą zadań i poprawia rozbieżne'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Użytkownicy do sprawdzenia (domyślnie wszyscy)')
+        parser.add_argument('--check', action='store_true', help='Tylko zgłoś rozbieżności i zakończ błędem, jeśli są')
+        parser.add_argument('--batch-size', type=int, default=500, help='Liczba użytkowników w jednej paczce')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        mismatches, last_pk = [], 0
+        while batch := list(users.filter(pk__gt=last_pk)[:options['batch_size']]):
+            found = stats.check(batch)
+            for model, pk, _, stored, actual in found:
+                self.stdout.write(f'{model.__name__} {pk}: zapisane {stored}, w zadaniach {actual}')
+            if found and not options['check']:
+                with transaction.atomic():
+                    for user_id in sorted({user_id for _, _, user_id, _, _ in found}):
+                        stats.recount_user(user_id)
+            mismatches += found
+            last_pk = batch[-1].pk
+        if options['check'] and mismatches:
+            raise CommandError(f'Niezgodne liczniki: {len(mismatches)}.')
+        verb = 'Znaleziono' if options['check'] else 'Poprawiono'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(mismatches)} niezgodnych liczników.'))
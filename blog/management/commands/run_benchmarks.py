@@ -0,0 +1,63 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from blog import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Mierzy czas i liczbę zapytań każdego adresu aplikacji i zapisuje wynik bazowy w JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Użytkownik, w imieniu którego idą żądania (domyślnie ten z największą liczbą zadań)')
+        parser.add_argument('--iterations', type=int, default=20, help='Liczba mierzonych powtórzeń każdego scenariusza')
+        parser.add_argument('--warmup', type=int, default=2, help='Powtórzenia przed pomiarem (cache, połączenia)')
+        parser.add_argument('--server', help='Adres działającego serwera, np. http://127.0.0.1:8000 - mierzone są wtedy tylko GET-y')
+        parser.add_argument('--only', nargs='+', help='Nazwy scenariuszy albo adresów (np. task-list api-tasks)')
+        parser.add_argument('--output', help='Plik JSON z wynikami (nowy wynik bazowy)')
+        parser.add_argument('--compare', help='Plik JSON z wynikiem bazowym - regresja kończy polecenie błędem')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Dopuszczalny wzrost p95 względem bazowego (0.25 = 25%%)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations musi być dodatnie, --warmup nieujemne.')
+        user = self.get_user(options['username'])
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Nie można wczytać wyniku bazowego: {exc}')
+
+        results = benchmarks.run(user, options['iterations'], options['warmup'], options['server'], options['only'])
+        self.stdout.write(f'{"scenariusz":<32} {"status":>8} {"p50":>9} {"p95":>9} {"p99":>9} {"zapytań":>8}')
+        for name, result in results['scenarios'].items():
+            status = ','.join(map(str, result['status']))
+            queries = '-' if result['queries'] is None else result['queries']
+            self.stdout.write(
+                f'{name:<32} {status:>8} {result["p50_ms"]:>7.2f}ms {result["p95_ms"]:>7.2f}ms {result["p99_ms"]:>7.2f}ms {queries:>8}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2, ensure_ascii=False)
+                output.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Zapisano wyniki w {options["output"]}.'))
+        if baseline is not None:
+            regressions = benchmarks.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regresje względem wyniku bazowego:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Brak regresji względem wyniku bazowego.'))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Użytkownik "{username}" nie istnieje.')
+        user = User.objects.annotate(task_count=Count('tasks')).order_by('-task_count', 'pk').first()
+        if user is None:
+            raise CommandError('Brak użytkowników - najpierw uruchom seed_perf_data.')
+        return user
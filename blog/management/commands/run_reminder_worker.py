@@ -0,0 +1,42 @@
+import signal
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from blog.reminders import BATCH_SIZE, LOOKAHEAD, POLL_INTERVAL, ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = 'Wysyła przypomnienia o zadaniach (EMAIL_BACKEND) dokładnie w ustawionym momencie'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Wysyła zaległe przypomnienia i kończy pracę (np. z crona)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Liczba przypomnień w jednej paczce')
+        parser.add_argument(
+            '--lookahead', type=int, default=int(LOOKAHEAD.total_seconds()),
+            help='Okno (w sekundach) przypomnień wczytywanych do kopca'
+        )
+        parser.add_argument(
+            '--poll-interval', type=int, default=int(POLL_INTERVAL.total_seconds()),
+            help='Co ile sekund dokładać do kopca nowe i zmienione przypomnienia'
+        )
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(
+            batch_size=options['batch_size'],
+            lookahead=timedelta(seconds=options['lookahead']),
+            poll_interval=timedelta(seconds=options['poll_interval']),
+        )
+        if options['once']:
+            scheduler.run_pending()
+        else:
+            signal.signal(signal.SIGTERM, lambda *args: scheduler.stop())
+            self.stdout.write('Worker przypomnień uruchomiony (Ctrl+C kończy pracę).')
+            try:
+                scheduler.run()
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Wysłano {scheduler.report["sent"]} przypomnień '
+            f'(bez adresu e-mail: {scheduler.report["without_email"]}).'
+        ))
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.perfdata import BATCH_SIZE, PASSWORD, PerfDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generuje powtarzalne dane do testów wydajności (użytkownicy, kategorie, tagi, zadania)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Liczba użytkowników')
+        parser.add_argument('--tasks', type=int, default=100_000, help='Łączna liczba zadań (od 1 tys. do 10 mln)')
+        parser.add_argument('--seed', type=int, default=42, help='Ziarno generatora - te same opcje dają te same dane')
+        parser.add_argument('--prefix', default='perf', help='Początek nazw tworzonych użytkowników')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Liczba zadań w jednej transakcji')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['tasks'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--users i --batch-size muszą być dodatnie, --tasks nieujemne.')
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f'Istnieją już użytkownicy "{options["prefix"]}*" - użyj innego --prefix albo pustej bazy.')
+        generator = PerfDataGenerator(options['prefix'], options['seed'], options['batch_size'])
+
+        def progress(created):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {created}/{options["tasks"]} zadań')
+
+        report = generator.generate(options['users'], options['tasks'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Utworzono {report["users"]} użytkowników i {report["tasks"]} zadań w {report["seconds"]} s '
+            f'({report["rows_per_second"] or 0} zadań/s). Hasło użytkowników: {PASSWORD}'
+        ))
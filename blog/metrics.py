@@ -0,0 +1,190 @@
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+
+# kwantyle liczone z ostatnich WINDOW żądań każdego widoku - suma i liczba od startu procesu
+WINDOW = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+METRICS = {
+    'request_seconds': 'Czas obsługi żądania (od wejścia do middleware do odpowiedzi)',
+    'db_queries': 'Liczba zapytań do bazy na żądanie',
+    'db_seconds': 'Czas zapytań do bazy na żądanie',
+    'template_seconds': 'Czas renderowania szablonów na żądanie',
+    'response_bytes': 'Rozmiar odpowiedzi (bez odpowiedzi strumieniowych)',
+}
+PREFIX = 'webblog_'
+UNMATCHED = 'unmatched'
+
+_current = contextvars.ContextVar('request_stats', default=None)
+_lock = threading.Lock()
+_summaries = {}
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class RollingSummary:
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.sum = 0
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Kwantyl z okna metodą najbliższej rangi"""
+        ordered = sorted(self.samples)
+        return ordered[max(math.ceil(q * len(ordered)) - 1, 0)] if ordered else None
+
+
+def _execute(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _install(connection, **kwargs):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+def install_query_timer():
+    """Licznik zapytań na każdym nowym połączeniu, w każdym wątku (także w wątkach ORM widoków async)
+
+    Wywoływane w BlogConfig.ready(), zanim powstanie jakiekolwiek połączenie.
+    """
+    connection_created.connect(_install, dispatch_uid='blog.metrics')
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Silnik szablonów Django mierzący czas renderowania dla PerformanceMiddleware"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def record(view, values):
+    with _lock:
+        for metric, value in values.items():
+            if value is not None:
+                _summaries.setdefault((metric, view), RollingSummary()).add(value)
+
+
+def reset():
+    with _lock:
+        _summaries.clear()
+
+
+def _labels(view, quantile=None):
+    view = view.replace('\\', '\\\\').replace('"', '\\"')
+    return f'{{view="{view}",quantile="{quantile}"}}' if quantile is not None else f'{{view="{view}"}}'
+
+
+def render_prometheus():
+    """Podsumowania (summary) wszystkich widoków w formacie tekstowym Prometheusa"""
+    with _lock:
+        summaries = sorted(_summaries.items())
+        lines = []
+        for metric, help_text in METRICS.items():
+            name = PREFIX + metric
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} summary']
+            for (summary_metric, view), summary in summaries:
+                if summary_metric != metric:
+                    continue
+                for quantile in QUANTILES:
+                    lines.append(f'{name}{_labels(view, quantile)} {summary.quantile(quantile):g}')
+                lines.append(f'{name}_sum{_labels(view)} {summary.sum:g}')
+                lines.append(f'{name}_count{_labels(view)} {summary.count}')
+    return '\n'.join(lines) + '\n'
+
+
+class PerformanceMiddleware:
+    """Czas żądania, zapytania do bazy i renderowanie szablonów - nagłówek Server-Timing i metryki /metrics
+
+    Przy PERFORMANCE_METRICS = False middleware wypada z łańcucha (MiddlewareNotUsed).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCE_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _current.set(RequestStats())
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response, _current.get())
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        token = _current.set(RequestStats())
+        try:
+            response = await self.get_response(request)
+            return self.finish(request, response, _current.get())
+        finally:
+            _current.reset(token)
+
+    def finish(self, request, response, stats):
+        elapsed = time.perf_counter() - stats.started
+        match = getattr(request, 'resolver_match', None)
+        record(match.view_name if match else UNMATCHED, {
+            'request_seconds': elapsed,
+            'db_queries': stats.db_queries,
+            'db_seconds': stats.db_seconds,
+            'template_seconds': stats.template_seconds,
+            'response_bytes': None if response.streaming else len(response.content),
+        })
+        response.headers['Server-Timing'] = (
+            f'total;dur={elapsed * 1000:.1f}, '
+            f'db;desc="{stats.db_queries} queries";dur={stats.db_seconds * 1000:.1f}, '
+            f'tpl;dur={stats.template_seconds * 1000:.1f}'
+        )
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['author', 'name'], name='category_author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['author', 'name'], name='tag_author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['author', 'is_completed', 'due_date', 'due_time'], name='task_author_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['author', 'due_date', 'is_completed', 'due_time'], name='task_author_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', False), ('reminder_date__isnull', False)), fields=['author', 'due_date', 'due_time', 'reminder_date'], name='task_active_reminder_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+import blog.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+from blog.search import get_backend
+
+
+def install_search_index(apps, schema_editor):
+    backend = get_backend(schema_editor.connection)
+    backend.install()
+    backend.rebuild()
+
+
+def uninstall_search_index(apps, schema_editor):
+    get_backend(schema_editor.connection).uninstall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_task_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskFTSEntry',
+            fields=[
+                ('task', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts_entry', serialize=False, to='blog.task')),
+                ('document', blog.models.SearchDocumentField(db_column='blog_task_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'blog_task_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskSearchDocument',
+            fields=[
+                ('task', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='blog.task')),
+                ('author_id', models.IntegerField()),
+                ('document', blog.models.SearchDocumentField()),
+            ],
+            options={
+                'db_table': 'blog_task_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:10
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_past_reminders_sent(apps, schema_editor):
+    # przypomnienia z minionych dni były już pokazane na stronie głównej - worker nie wysyła ich ponownie
+    Task = apps.get_model('blog', 'Task')
+    Task.objects.filter(reminder_date__lt=timezone.localdate()).update(reminder_sent_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_task_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_active_reminder_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', False), ('reminder_sent_at__isnull', False)), fields=['author', 'due_date', 'due_time'], name='task_sent_reminder_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', False), ('reminder_date__isnull', False), ('reminder_sent_at__isnull', True)), fields=['reminder_date', 'reminder_time', 'id'], name='task_pending_reminder_idx'),
+        ),
+        migrations.RunPython(mark_past_reminders_sent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def count_tasks(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Category = apps.get_model('blog', 'Category')
+    TaskStats = apps.get_model('blog', 'TaskStats')
+    CategoryStats = apps.get_model('blog', 'CategoryStats')
+    completed = Q(tasks__is_completed=True)
+    TaskStats.objects.bulk_create(
+        [
+            TaskStats(user_id=pk, total=total, completed=done)
+            for pk, total, done in User.objects.annotate(total=Count('tasks'), done=Count('tasks', filter=completed))
+            .values_list('pk', 'total', 'done').iterator()
+        ],
+        batch_size=1000,
+    )
+    CategoryStats.objects.bulk_create(
+        [
+            CategoryStats(category_id=pk, total=total, completed=done)
+            for pk, total, done in Category.objects.annotate(total=Count('tasks'), done=Count('tasks', filter=completed))
+            .values_list('pk', 'total', 'done').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0006_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to='blog.category')),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Category stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Task stats',
+            },
+        ),
+        migrations.RunPython(count_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0007_task_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='recurrence',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='TaskOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('is_completed', models.BooleanField(default=True)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='blog.task')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['author', 'date'], name='occurrence_author_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='taskoccurrence',
+            constraint=models.UniqueConstraint(fields=('task', 'date'), name='unique_occurrence_per_task'),
+        ),
+    ]
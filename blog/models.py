@@ -1,15 +1,45 @@
-from datetime import date
+from datetime import datetime
 
 from django.contrib.auth.models import User
 from django.core.validators import MinLengthValidator
-from django.db import models
+from django.db import models, router
+from django.db.models import F, Func, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import recurrence as recurrence_rules
+from .transactions import immediate_atomic
+
+
+def overdue_q(now=None, prefix=''):
+    """Warunek "po terminie" dla zadań - prefix pozwala użyć go przez relację, np. 'tasks__'"""
+    now = now or timezone.localtime()
+    return Q(**{f'{prefix}is_completed': False}) & (
+        Q(**{f'{prefix}due_date__lt': now.date()}) |
+        Q(**{f'{prefix}due_date': now.date(), f'{prefix}due_time__lt': now.time()})
+    )
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_task_stats(self, user, now=None):
+        """Kategorie z liczbą zadań (wszystkie/aktywne/ukończone z CategoryStats, po terminie z indeksu) w jednym zapytaniu"""
+        overdue = (
+            Task.objects.filter(overdue_q(now), author=user, category=OuterRef('pk')).order_by()
+            .annotate(count=Func('pk', function='COUNT')).values('count')
+        )
+        return self.annotate(
+            task_count=Coalesce(F('task_stats__total'), 0),
+            active_count=Coalesce(F('task_stats__total') - F('task_stats__completed'), 0),
+            completed_count=Coalesce(F('task_stats__completed'), 0),
+            overdue_count=Coalesce(Subquery(overdue), 0),
+        ).order_by('name')
 
 
 class Category(models.Model):
     name = models.CharField(max_length=50)
     color = models.CharField(max_length=7, default='#64748b')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="categories", null=True, blank=True)
-    objects = models.Manager()
+    objects = CategoryQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = 'Categories'
@@ -17,6 +47,9 @@ class Category(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['name', 'author'], name='unique_category_per_user')
         ]
+        indexes = [
+            models.Index(fields=['author', 'name'], name='category_author_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -32,11 +65,34 @@ class Tag(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['name', 'author'], name='unique_tag_per_user')
         ]
+        indexes = [
+            models.Index(fields=['author', 'name'], name='tag_author_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class TaskQuerySet(models.QuerySet):
+    def for_listing(self, user):
+        """Zadania użytkownika razem z kategorią i tagami - stała liczba zapytań niezależnie od liczby zadań"""
+        return self.filter(author=user).select_related('category').prefetch_related('tags')
+
+    def overdue(self, now=None):
+        """Zadania nieukończone, których termin (data + godzina) już minął - liczone w SQL"""
+        return self.filter(overdue_q(now))
+
+    def pending_reminders(self):
+        """Przypomnienia aktywnych zadań, które nie zostały jeszcze wysłane"""
+        return self.filter(
+            is_completed=False, reminder_date__isnull=False, reminder_time__isnull=False, reminder_sent_at__isnull=True
+        )
+
+    def sent_reminders(self, user):
+        """Aktywne zadania użytkownika, dla których przypomnienie zostało już wysłane"""
+        return self.filter(author=user, is_completed=False, reminder_sent_at__isnull=False)
+
+
 class Task(models.Model):
     PRIORITY_CHOICES = [
         ('low', 'Niski'),
@@ -50,26 +106,235 @@ class Task(models.Model):
     title = models.CharField(max_length=127, validators=[MinLengthValidator(3)])
     description = models.TextField(blank=True)
     created_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     due_date = models.DateField()
     due_time = models.TimeField(default='00:00')
     reminder_date = models.DateField(blank=True, null=True)
     reminder_time = models.TimeField(blank=True, null=True)
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
     is_completed = models.BooleanField(default=False)
-    objects = models.Manager()
+    # ustawiane przez run_reminder_worker po wysłaniu przypomnienia; zmiana terminu przypomnienia je zeruje
+    reminder_sent_at = models.DateTimeField(blank=True, null=True, editable=False)
+    # reguła z podzbioru RRULE (blog.recurrence) - due_date jest wtedy terminem bieżącego wystąpienia serii,
+    # a zamknięte wystąpienia trafiają do TaskOccurrence; przyszłych nie zapisuje się nigdzie
+    recurrence = models.CharField(max_length=100, blank=True, default='')
+    objects = TaskQuerySet.as_manager()
+
+    # pola, od których zależą liczniki TaskStats i CategoryStats (blog.stats)
+    COUNTED_FIELDS = ('author_id', 'category_id', 'is_completed')
 
     class Meta:
         ordering = ['is_completed', 'due_date', 'due_time']
+        indexes = [
+            # lista zadań, strona główna, API i filtr "po terminie" - zgodne z Meta.ordering
+            models.Index(fields=['author', 'is_completed', 'due_date', 'due_time'], name='task_author_listing_idx'),
+            # filtr "na dziś" - równość na due_date, sortowanie po pozostałych kolumnach
+            models.Index(fields=['author', 'due_date', 'is_completed', 'due_time'], name='task_author_due_idx'),
+            # wysłane przypomnienia aktywnych zadań na stronie głównej - w porządku Meta.ordering
+            models.Index(
+                fields=['author', 'due_date', 'due_time'],
+                condition=Q(is_completed=False, reminder_sent_at__isnull=False),
+                name='task_sent_reminder_idx',
+            ),
+            # kolejka run_reminder_worker: tylko przypomnienia czekające na wysłanie, w kolejności terminu
+            models.Index(
+                fields=['reminder_date', 'reminder_time', 'id'],
+                condition=Q(is_completed=False, reminder_date__isnull=False, reminder_sent_at__isnull=True),
+                name='task_pending_reminder_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        task = super().from_db(db, field_names, values)
+        # stan policzony w licznikach - usunięcie zdejmuje zadanie z liczników bez zapytania o stary (blog.signals);
+        # zapis doczytuje go pod blokadą wiersza
+        if all(field in field_names for field in cls.COUNTED_FIELDS):
+            task._counted_state = tuple(getattr(task, field) for field in cls.COUNTED_FIELDS)
+        return task
+
+    def save(self, *args, **kwargs):
+        # odczyt stanu sprzed zmiany (sygnał pre_save), zapis i liczniki (post_save) w jednej transakcji
+        using = kwargs.get('using') or router.db_for_write(Task, instance=self)
+        with immediate_atomic(using, savepoint=False):
+            super().save(*args, **kwargs)
+
+    @property
+    def recurrence_display(self):
+        return recurrence_rules.describe(self.recurrence)
+
+    @property
+    def missed_occurrences(self):
+        """Wystąpienia serii po terminie - bieżące i kolejne, które minęły, zanim bieżące zostało zamknięte"""
+        if not self.recurrence or self.is_completed:
+            return 0
+        now = timezone.localtime().replace(tzinfo=None)
+        return recurrence_rules.missed(self.recurrence, self.due_date, self.due_time, now)
+
+    def complete_occurrence(self, skip=False):
+        """Zamyka bieżące wystąpienie serii (ukończone albo pominięte) i przesuwa termin na następne
+
+        Po ostatnim wystąpieniu (UNTIL) cała seria staje się ukończona. Przypomnienie przesuwa się razem z terminem.
+        """
+        TaskOccurrence.objects.create(task=self, author_id=self.author_id, date=self.due_date, is_completed=not skip)
+        self.advance_occurrence()
+        self.save()
+
+    def advance_occurrence(self):
+        """Przesuwa termin i przypomnienie na następne wystąpienie serii (bez zapisu) - po ostatnim seria jest ukończona"""
+        following = recurrence_rules.following(self.recurrence, self.due_date)
+        if following is None:
+            self.is_completed = True
+        else:
+            if self.reminder_date:
+                self.reminder_date += following - self.due_date
+                self.reminder_sent_at = None
+            self.due_date = following
+
+    def reopen(self):
+        """Przywraca ukończone zadanie - w zakończonej serii ostatnie wystąpienie znów czeka na wykonanie"""
+        if self.recurrence:
+            TaskOccurrence.objects.filter(task=self, date=self.due_date).delete()
+        self.is_completed = False
+        self.save()
+
     @property
     def is_overdue(self):
         """Sprawdza czy zadanie jest po terminie (nieukończone i data/czas minął)"""
-        from datetime import datetime
         if self.is_completed:
             return False
-        now = datetime.now()
+        now = timezone.localtime().replace(tzinfo=None)
         task_deadline = datetime.combine(self.due_date, self.due_time)
         return now > task_deadline
+
+
+class TaskOccurrence(models.Model):
+    """Zamknięte wystąpienie zadania cyklicznego - ukończone albo pominięte; przyszłe wystąpienia wylicza blog.recurrence"""
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='occurrences')
+    # kopia autora zadania - zakres agendy czyta wystąpienia użytkownika z indeksu bez złączenia z zadaniami
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    date = models.DateField()
+    is_completed = models.BooleanField(default=True)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'date'], name='unique_occurrence_per_task')
+        ]
+        indexes = [
+            models.Index(fields=['author', 'date'], name='occurrence_author_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task_id} {self.date}{"" if self.is_completed else " (pominięte)"}'
+
+
+class ChangeLogEntry(models.Model):
+    """Zmiana zadania, kategorii albo tagu użytkownika - rosnące id jest tokenem synchronizacji (/api/sync/)"""
+    TASK, CATEGORY, TAG = 'task', 'category', 'tag'
+    KIND_CHOICES = [
+        (TASK, 'Zadanie'),
+        (CATEGORY, 'Kategoria'),
+        (TAG, 'Tag'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # nagrobek - obiekt został usunięty
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # zmiany użytkownika po tokenie: koszt zależy od liczby zmian, nie od liczby zadań
+            models.Index(fields=['user', 'id'], name='changelog_user_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}{" (usunięty)" if self.deleted else ""}'
+
+
+class TaskStats(models.Model):
+    """Liczniki zadań użytkownika aktualizowane przy każdym zapisie zadania (blog.stats) - odczyt bez liczenia wierszy"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='task_stats')
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Task stats'
+
+    def __str__(self):
+        return f'{self.user}: {self.completed}/{self.total}'
+
+    @property
+    def active(self):
+        return self.total - self.completed
+
+
+class CategoryStats(models.Model):
+    """Liczniki zadań kategorii, utrzymywane razem z TaskStats"""
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='task_stats')
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Category stats'
+
+    def __str__(self):
+        return f'{self.category}: {self.completed}/{self.total}'
+
+    @property
+    def active(self):
+        return self.total - self.completed
+
+
+class Match(models.Lookup):
+    """Dopasowanie pełnotekstowe: `kolumna MATCH zapytanie` (SQLite FTS5) albo `kolumna @@ tsquery` (PostgreSQL)"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        if connection.vendor == 'postgresql':
+            return f"{lhs} @@ to_tsquery('simple', {rhs})", lhs_params + rhs_params
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SearchDocumentField(models.TextField):
+    """Kolumna dokumentu w tabeli indeksu wyszukiwania - obsługuje lookup `match`"""
+
+
+SearchDocumentField.register_lookup(Match)
+
+
+class TaskFTSEntry(models.Model):
+    """Wiersz wirtualnej tabeli FTS5 (SQLite) - tabelą zarządza blog.search, nie migracje"""
+    task = models.OneToOneField(
+        Task, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='fts_entry'
+    )
+    # ukryta kolumna o nazwie tabeli - to jej dotyczy MATCH
+    document = SearchDocumentField(db_column='blog_task_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'blog_task_fts'
+
+
+class TaskSearchDocument(models.Model):
+    """Wiersz tabeli z kolumną tsvector (PostgreSQL) - tabelą zarządza blog.search, nie migracje"""
+    task = models.OneToOneField(
+        Task, on_delete=models.DO_NOTHING, primary_key=True, db_constraint=False, related_name='search_document'
+    )
+    author_id = models.IntegerField()
+    document = SearchDocumentField()
+
+    class Meta:
+        managed = False
+        db_table = 'blog_task_search'
@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+from datetime import date, time
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+TASK_ORDERING = ('is_completed', 'due_date', 'due_time', 'id')
+
+
+def _cursor_value(value):
+    return value.isoformat() if isinstance(value, (date, time)) else value
+
+
+def encode_cursor(task, ordering=TASK_ORDERING):
+    """Zamienia pozycję zadania (instancji albo wiersza .values()) w danym porządku listy na nieprzezroczysty token"""
+    position = [
+        _cursor_value(task[field.lstrip('-')] if isinstance(task, dict) else getattr(task, field.lstrip('-')))
+        for field in ordering
+    ]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering=TASK_ORDERING):
+    """Odczytuje pozycję z tokena - ValueError dla tokenów niepoprawnych"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError('Niepoprawny kursor') from exc
+    if not isinstance(position, list) or len(position) != len(ordering):
+        raise ValueError('Niepoprawny kursor')
+    return position
+
+
+def after_cursor(queryset, cursor, ordering=TASK_ORDERING):
+    """Zadania leżące za pozycją kursora w danym porządku (keyset zamiast OFFSET)"""
+    position = decode_cursor(cursor, ordering)
+    first = ordering[0].lstrip('-')
+    first_lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+    # nadmiarowy warunek na pierwszej kolumnie pozwala bazie zawęzić zakres indeksu
+    condition, equal = Q(), {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    try:
+        return queryset.filter(Q(**{f'{first}__{first_lookup}': position[0]}), condition)
+    except (TypeError, ValidationError) as exc:
+        raise ValueError('Niepoprawny kursor') from exc
+
+
+def _page_queryset(queryset, cursor, page_size, ordering):
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = after_cursor(queryset, cursor, ordering)
+    # jeden wiersz ponad stronę mówi, czy istnieje następna
+    return queryset[:page_size + 1]
+
+
+def _split_page(tasks, page_size, ordering):
+    if len(tasks) > page_size:
+        tasks = tasks[:page_size]
+        return tasks, encode_cursor(tasks[-1], ordering)
+    return tasks, None
+
+
+def paginate_tasks(queryset, cursor=None, page_size=50, ordering=TASK_ORDERING):
+    """Zwraca (zadania strony, kursor następnej strony albo None) - koszt O(page_size) na każdej głębokości"""
+    return _split_page(list(_page_queryset(queryset, cursor, page_size, ordering)), page_size, ordering)
+
+
+async def apaginate_tasks(queryset, cursor=None, page_size=50, ordering=TASK_ORDERING):
+    """paginate_tasks dla widoków asynchronicznych"""
+    page = _page_queryset(queryset, cursor, page_size, ordering)
+    return _split_page([task async for task in page], page_size, ordering)
+
+
+class TaskCursorPagination(BasePagination):
+    """Paginacja kursorowa API po pełnym porządku listy zadań (DRF CursorPagination obsługuje tylko jedno pole)"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            tasks, self.next_cursor = paginate_tasks(
+                queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request)
+            )
+        except ValueError:
+            raise NotFound('Niepoprawny kursor.')
+        return tasks
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset dla widoków asynchronicznych"""
+        self.request = request
+        try:
+            tasks, self.next_cursor = await apaginate_tasks(
+                queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request)
+            )
+        except ValueError:
+            raise NotFound('Niepoprawny kursor.')
+        return tasks
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,150 @@
+import random
+import time
+from datetime import datetime, time as time_of_day, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import changelog, signals, stats
+from .forms import provision_default_tags
+from .models import CategoryStats, ChangeLogEntry, Task, TaskStats, Category, Tag
+from .search import get_backend
+
+
+BATCH_SIZE = 5000
+PASSWORD = 'haslo12345'
+CATEGORIES = [
+    ('Praca', '#2563eb'), ('Dom', '#16a34a'), ('Zakupy', '#f59e0b'), ('Studia', '#9333ea'),
+    ('Zdrowie', '#dc2626'), ('Finanse', '#0d9488'), ('Rodzina', '#db2777'), ('Hobby', '#64748b'),
+]
+EXTRA_TAGS = ['klient', 'biuro', 'samochód', 'urlop', 'remont', 'podatki', 'kurs', 'wyjazd']
+VERBS = ['Zadzwonić do', 'Kupić', 'Przygotować', 'Wysłać', 'Sprawdzić', 'Zapłacić za', 'Umówić', 'Napisać', 'Oddać']
+OBJECTS = [
+    'klienta', 'raport kwartalny', 'fakturę', 'prezentację', 'mleko i chleb', 'dentystę', 'ofertę',
+    'mechanika', 'czynsz', 'umowę', 'notatki z wykładu', 'przegląd auta', 'bilety', 'prezent',
+]
+DESCRIPTIONS = [
+    'Szczegóły w mailu z poniedziałku.', 'Nie zapomnieć o dokumentach.', 'Zapytać o termin i cenę.',
+    'Potrzebne przed spotkaniem zespołu.', 'Sprawdzić dwa warianty i wybrać tańszy.',
+]
+PRIORITIES = (['low'] * 3) + (['medium'] * 5) + (['high'] * 2)
+
+
+class PerfDataGenerator:
+    """Powtarzalne (stałe ziarno) dane do testów wydajności - użytkownicy, kategorie, tagi i zadania
+
+    Zadania powstają porcjami przez bulk_create, więc pamięć nie rośnie z liczbą wierszy. Rozkład zadań
+    między użytkowników jest skośny (pierwszy ma najwięcej), jak w prawdziwej aplikacji.
+    """
+
+    def __init__(self, prefix='perf', seed=42, batch_size=BATCH_SIZE, now=None):
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.now = now or timezone.localtime().replace(tzinfo=None, second=0, microsecond=0)
+        self.labels = {}
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create([
+            User(username=f'{self.prefix}{i:05d}', email=f'{self.prefix}{i:05d}@example.com', password=password)
+            for i in range(1, count + 1)
+        ], batch_size=self.batch_size)
+        provision_default_tags(users)
+        categories = Category.objects.bulk_create([
+            Category(author=user, name=name, color=color)
+            for user in users for name, color in CATEGORIES[:self.random.randint(3, len(CATEGORIES))]
+        ], batch_size=self.batch_size)
+        tags = Tag.objects.bulk_create([
+            Tag(author=user, name=name) for user in users for name in self.random.sample(EXTRA_TAGS, 3)
+        ], batch_size=self.batch_size)
+        # bulk_create nie wysyła post_save, który zakłada liczniki użytkowników i kategorii
+        TaskStats.objects.bulk_create([TaskStats(user=user) for user in users], batch_size=self.batch_size)
+        CategoryStats.objects.bulk_create([CategoryStats(category=c) for c in categories], batch_size=self.batch_size)
+        self.labels = {user.pk: ([], []) for user in users}
+        for category in categories:
+            self.labels[category.author_id][0].append(category.pk)
+        # domyślne tagi powstały z ignore_conflicts, więc bez kluczy - pobieramy je jednym zapytaniem
+        for start in range(0, len(users), self.batch_size):
+            chunk = users[start:start + self.batch_size]
+            for author_id, tag_id in Tag.objects.filter(author__in=chunk).order_by('pk').values_list('author_id', 'id'):
+                self.labels[author_id][1].append(tag_id)
+        # bulk_create nie wysyła sygnałów - nowe etykiety zapisujemy w dzienniku zmian jednym zapisem, jak domyślne tagi
+        ChangeLogEntry.objects.bulk_create(
+            [ChangeLogEntry(user_id=c.author_id, kind=ChangeLogEntry.CATEGORY, object_id=c.pk) for c in categories]
+            + [ChangeLogEntry(user_id=t.author_id, kind=ChangeLogEntry.TAG, object_id=t.pk) for t in tags],
+            batch_size=self.batch_size,
+        )
+        return users
+
+    def task(self, user_id, number):
+        rng = self.random
+        due = self.now + timedelta(days=rng.randint(-180, 180), minutes=15 * rng.randint(-48, 48))
+        data = {
+            'author_id': user_id,
+            'title': f'{rng.choice(VERBS)} {rng.choice(OBJECTS)} #{number}',
+            'description': rng.choice(DESCRIPTIONS) if rng.random() < 0.5 else '',
+            'due_date': due.date(),
+            'due_time': due.time(),
+            'priority': rng.choice(PRIORITIES),
+            'is_completed': rng.random() < (0.7 if due < self.now else 0.1),
+        }
+        categories, tags = self.labels[user_id]
+        if categories and rng.random() < 0.8:
+            data['category_id'] = rng.choice(categories)
+        if rng.random() < 0.3:
+            reminder = datetime.combine(due.date() - timedelta(days=rng.randint(0, 3)), time_of_day(rng.choice([7, 8, 9, 18])))
+            data['reminder_date'], data['reminder_time'] = reminder.date(), reminder.time()
+            # przeszłe przypomnienia są już "wysłane" - worker nie rozsyła ich po załadowaniu danych
+            if reminder <= self.now:
+                data['reminder_sent_at'] = timezone.now()
+        return Task(**data), rng.sample(tags, min(len(tags), rng.choice([0, 0, 1, 1, 2, 3])))
+
+    def tasks(self, users, count):
+        """Zadania rozłożone między użytkowników z wagą 1/pozycja - generator, bez listy w pamięci"""
+        weights = [1 / rank for rank in range(1, len(users) + 1)]
+        numbers = {}
+        for start in range(0, count, self.batch_size):
+            for user in self.random.choices(users, weights, k=min(self.batch_size, count - start)):
+                numbers[user.pk] = numbers.get(user.pk, 0) + 1
+                yield self.task(user.pk, numbers[user.pk])
+
+    def write(self, rows):
+        rows = list(rows)
+        with transaction.atomic(), signals.suspended():
+            tasks = Task.objects.bulk_create([task for task, _ in rows])
+            Task.tags.through.objects.bulk_create([
+                Task.tags.through(task_id=task.pk, tag_id=tag_id) for task, tag_ids in rows for tag_id in tag_ids
+            ])
+            get_backend().index_tasks([task.pk for task in tasks])
+            stats.apply(after=[stats.counted_state(task) for task in tasks])
+            by_user = {}
+            for task in tasks:
+                by_user.setdefault(task.author_id, []).append(task.pk)
+            for user_id, task_ids in by_user.items():
+                changelog.record(user_id, ChangeLogEntry.TASK, task_ids)
+        return len(tasks)
+
+    def generate(self, users, tasks, progress=None):
+        """Tworzy użytkowników i zadania - zwraca raport z liczbą wierszy i wierszy na sekundę"""
+        started = time.perf_counter()
+        with transaction.atomic():
+            created_users = self.create_users(users)
+        created = 0
+        rows = self.tasks(created_users, tasks)
+        while batch := list(islice(rows, self.batch_size)):
+            created += self.write(batch)
+            if progress:
+                progress(created)
+        for user in created_users:
+            signals.data_changed(user.pk)
+        elapsed = time.perf_counter() - started
+        return {
+            'users': len(created_users),
+            'tasks': created,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(created / elapsed) if elapsed else None,
+        }
@@ -0,0 +1,209 @@
+import contextvars
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger(__name__)
+
+# literały, liczby i listy parametrów zamieniane na "?" - zapytania różniące się tylko wartościami mają ten sam kształt
+NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?)'),
+    (re.compile(r'\s+'), ' '),
+]
+PROJECT_DIRS = tuple(
+    os.path.join(str(settings.BASE_DIR), app) + os.sep for app in ('blog', 'accounts', 'WebBlogProject')
+)
+# własne opakowania zapytań (execute_wrapper) nie są miejscem pochodzenia zapytania
+WRAPPER_FILES = {__file__, os.path.join(os.path.dirname(__file__), 'metrics.py')}
+
+_current = contextvars.ContextVar('query_report', default=None)
+
+
+def normalize(sql):
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def _origin():
+    """Linia szablonu renderowanego w chwili zapytania i linia kodu projektu, z której ono wyszło"""
+    template = code = None
+    frame = sys._getframe(2)
+    while frame and not (template and code):
+        node = frame.f_locals.get('self') if frame.f_code.co_name == 'render_annotated' else None
+        if template is None and node is not None and getattr(node, 'token', None) and node.origin:
+            template = f'{node.origin.template_name or node.origin.name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if code is None and filename.startswith(PROJECT_DIRS) and filename not in WRAPPER_FILES:
+            code = f'{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return template, code
+
+
+class QueryReport:
+    """Zapytania wykonane w trakcie żądania albo testu, pogrupowane po znormalizowanym kształcie"""
+
+    def __init__(self, label=''):
+        self.label = label
+        self.queries = []
+
+    def add(self, sql, seconds):
+        template, code = _origin()
+        self.queries.append((normalize(sql), sql, seconds, template, code))
+
+    @property
+    def total_seconds(self):
+        return sum(seconds for _, _, seconds, _, _ in self.queries)
+
+    def groups(self):
+        groups = defaultdict(list)
+        for query in self.queries:
+            groups[query[0]].append(query)
+        return groups
+
+    def repeated(self, threshold=None):
+        """Odczyty tego samego kształtu wykonane co najmniej threshold razy - typowy objaw N+1
+
+        Zapisy są pomijane - bulk_create dzieli duże paczki na kilka identycznych INSERT-ów.
+        """
+        threshold = threshold or getattr(settings, 'QUERY_CHECK_REPEATS', 3)
+        return {
+            shape: queries for shape, queries in self.groups().items()
+            if len(queries) >= threshold and shape.upper().startswith('SELECT')
+        }
+
+    def slow(self, threshold_ms=None):
+        threshold_ms = threshold_ms if threshold_ms is not None else getattr(settings, 'QUERY_CHECK_SLOW_MS', 100)
+        return [query for query in self.queries if query[2] * 1000 >= threshold_ms]
+
+    def problems(self):
+        lines = []
+        for shape, queries in self.repeated().items():
+            _, _, _, template, code = queries[-1]
+            lines.append(f'  N+1: {len(queries)}x {shape[:300]}')
+            lines.append(f'       {" / ".join(filter(None, [template, code])) or "poza kodem projektu"}')
+        for _, sql, seconds, template, code in self.slow():
+            lines.append(f'  wolne ({seconds * 1000:.0f} ms): {sql[:300]}')
+            lines.append(f'       {" / ".join(filter(None, [template, code])) or "poza kodem projektu"}')
+        return lines
+
+    def log(self):
+        lines = self.problems()
+        if lines:
+            logger.warning(
+                '%s: %d zapytań, %.1f ms\n%s', self.label, len(self.queries), self.total_seconds * 1000, '\n'.join(lines)
+            )
+
+
+def _execute(execute, sql, params, many, context):
+    report = _current.get()
+    if report is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        report.add(sql, time.perf_counter() - started)
+
+
+def _install(connection, **kwargs):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+def install():
+    """Zbieranie zapytań na każdym nowym połączeniu - wywoływane w BlogConfig.ready() przy QUERY_CHECK"""
+    connection_created.connect(_install, dispatch_uid='blog.querycheck')
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+class capture:
+    """with capture() as report: ... - zapytania wykonane w bloku (także w wątkach ORM widoków async)"""
+
+    def __init__(self, label=''):
+        self.report = QueryReport(label)
+
+    def __enter__(self):
+        install()
+        self.token = _current.set(self.report)
+        return self.report
+
+    def __exit__(self, *exc_info):
+        _current.reset(self.token)
+
+
+def query_budget(max_queries):
+    """Deklaruje największą dopuszczalną liczbę zapytań widoku (funkcji albo klasy) - sprawdzane przez QueryCheckMiddleware"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def budget_of(view):
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view, 'view_class', None), 'query_budget', None)
+    return budget
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCheckMiddleware:
+    """W trybie QUERY_CHECK (domyślnie przy DEBUG) wypisuje N+1 i wolne zapytania każdego żądania
+
+    Przy QUERY_CHECK_ENFORCE_BUDGETS żądanie widoku, który przekroczył swój query_budget, kończy się
+    wyjątkiem QueryBudgetExceeded - w testach klient testowy zgłasza go jako błąd testu.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_CHECK', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with capture() as report:
+            response = self.get_response(request)
+        self.check(request, report)
+        return response
+
+    async def __acall__(self, request):
+        with capture() as report:
+            response = await self.get_response(request)
+        self.check(request, report)
+        return response
+
+    def check(self, request, report):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return
+        report.label = f'{match.view_name} ({match._func_path})'
+        report.log()
+        budget = budget_of(match.func)
+        if budget is not None and len(report.queries) > budget and getattr(settings, 'QUERY_CHECK_ENFORCE_BUDGETS', False):
+            shapes = '\n'.join(f'  {len(queries)}x {shape[:200]}' for shape, queries in report.groups().items())
+            raise QueryBudgetExceeded(
+                f'{report.label}: {len(report.queries)} zapytań przy budżecie {budget}\n{shapes}'
+            )
@@ -0,0 +1,173 @@
+import calendar
+from collections import deque, namedtuple
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# gotowe reguły w formularzu zadania - w API można podać dowolną regułę z obsługiwanego podzbioru RRULE
+PRESETS = [
+    ('', 'Nie powtarza się'),
+    ('FREQ=DAILY', 'Codziennie'),
+    ('FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR', 'W dni robocze'),
+    ('FREQ=WEEKLY', 'Co tydzień'),
+    ('FREQ=MONTHLY', 'Co miesiąc'),
+]
+MAX_COUNT = 1000
+# tyle okresów z rzędu bez wystąpienia (np. BYMONTHDAY=31 co 12 miesięcy od lutego) kończy serię
+MAX_EMPTY_PERIODS = 100
+# seria bez końca kończy się tu, a nie błędem przepełnienia daty
+LAST_DAY = date(9000, 12, 31)
+
+Rule = namedtuple('Rule', ['freq', 'interval', 'byday', 'bymonthday', 'until', 'count'], defaults=(1, (), (), None, None))
+
+
+def _number(name, value, low, high, signed=False):
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or not low <= (abs(number) if signed else number) <= high:
+        raise ValueError(f'Niepoprawna wartość {name} w regule powtarzania.')
+    return number
+
+
+def parse(text):
+    """Reguła z podzbioru RRULE (RFC 5545): FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY, BYMONTHDAY, COUNT, UNTIL
+
+    ValueError z komunikatem dla użytkownika przy regule spoza podzbioru.
+    """
+    parts = {}
+    for part in text.upper().removeprefix('RRULE:').split(';'):
+        name, sep, value = part.partition('=')
+        if not sep or not value or name in parts:
+            raise ValueError('Reguła powtarzania musi mieć postać NAZWA=wartość;... (np. FREQ=WEEKLY;BYDAY=MO).')
+        parts[name] = value
+    freq = parts.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise ValueError('Reguła powtarzania musi mieć FREQ=DAILY, WEEKLY albo MONTHLY.')
+    rule = Rule(freq)
+    if 'INTERVAL' in parts:
+        rule = rule._replace(interval=_number('INTERVAL', parts.pop('INTERVAL'), 1, 999))
+    if 'BYDAY' in parts:
+        byday = parts.pop('BYDAY').split(',')
+        if freq != 'WEEKLY' or not set(byday) <= set(WEEKDAYS):
+            raise ValueError('BYDAY (MO,TU,...) jest obsługiwane tylko przy FREQ=WEEKLY.')
+        rule = rule._replace(byday=tuple(sorted({WEEKDAYS.index(day) for day in byday})))
+    if 'BYMONTHDAY' in parts:
+        if freq != 'MONTHLY':
+            raise ValueError('BYMONTHDAY jest obsługiwane tylko przy FREQ=MONTHLY.')
+        bymonthday = {_number('BYMONTHDAY', day, 1, 31, signed=True) for day in parts.pop('BYMONTHDAY').split(',')}
+        rule = rule._replace(bymonthday=tuple(sorted(bymonthday)))
+    if 'UNTIL' in parts:
+        until = parts.pop('UNTIL')
+        try:
+            rule = rule._replace(until=date(int(until[:4]), int(until[4:6]), int(until[6:8])))
+        except ValueError:
+            raise ValueError('UNTIL musi być datą w formacie RRRRMMDD.')
+    if 'COUNT' in parts:
+        rule = rule._replace(count=_number('COUNT', parts.pop('COUNT'), 1, MAX_COUNT))
+        if rule.until:
+            raise ValueError('Reguła powtarzania może mieć COUNT albo UNTIL, nie oba naraz.')
+    if parts:
+        raise ValueError(f'Nieobsługiwane części reguły powtarzania: {", ".join(sorted(parts))}.')
+    return rule
+
+
+def format_rule(rule):
+    parts = [f'FREQ={rule.freq}']
+    if rule.interval != 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.byday:
+        parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in rule.byday))
+    if rule.bymonthday:
+        parts.append('BYMONTHDAY=' + ','.join(map(str, rule.bymonthday)))
+    if rule.count:
+        parts.append(f'COUNT={rule.count}')
+    if rule.until:
+        parts.append(f'UNTIL={rule.until:%Y%m%d}')
+    return ';'.join(parts)
+
+
+def _periods(rule, start, since):
+    """Kandydaci na wystąpienia okres po okresie (dzień/tydzień/miesiąc), od okresu zawierającego since"""
+    if rule.freq == 'DAILY':
+        day = start + timedelta(days=(since - start).days // rule.interval * rule.interval)
+        while day <= LAST_DAY:
+            yield [day]
+            day += timedelta(days=rule.interval)
+    elif rule.freq == 'WEEKLY':
+        anchor = start - timedelta(days=start.weekday())
+        weeks = (since - anchor).days // 7 // rule.interval * rule.interval
+        week = anchor + timedelta(weeks=weeks)
+        weekdays = rule.byday or (start.weekday(),)
+        while week <= LAST_DAY:
+            yield [week + timedelta(days=day) for day in weekdays]
+            week += timedelta(weeks=rule.interval)
+    else:
+        months = (since.year - start.year) * 12 + since.month - start.month
+        month = start.year * 12 + start.month - 1 + months // rule.interval * rule.interval
+        monthdays = rule.bymonthday or (start.day,)
+        while month // 12 <= LAST_DAY.year:
+            year, month_index = divmod(month, 12)
+            length = calendar.monthrange(year, month_index + 1)[1]
+            # ujemny dzień liczy się od końca miesiąca (-1 to ostatni), a 31 w krótszym miesiącu jest pomijane
+            days = sorted({day if day > 0 else length + 1 + day for day in monthdays})
+            yield [date(year, month_index + 1, day) for day in days if 1 <= day <= length]
+            month += rule.interval
+
+
+def occurrences(rule, start, since=None):
+    """Kolejne daty wystąpień serii zaczynającej się w start, od since włącznie - leniwy generator
+
+    Bez UNTIL ciąg jest nieskończony: ograniczeniem jest to, ile dat weźmie wywołujący (np. do końca zakresu).
+    COUNT liczy wystąpienia od start, więc najpierw zamień je na UNTIL przez normalize().
+    """
+    since = max(start, since or start)
+    empty = 0
+    for days in _periods(rule, start, since):
+        days = [day for day in days if day >= since]
+        empty = 0 if days else empty + 1
+        if empty > MAX_EMPTY_PERIODS:
+            return
+        for day in days:
+            if rule.until and day > rule.until:
+                return
+            yield day
+
+
+def normalize(text, start):
+    """(reguła w postaci kanonicznej, pierwsze wystąpienie od start) - COUNT zamieniane na UNTIL
+
+    Seria przechowuje tylko termin bieżącego wystąpienia, więc licznik wystąpień od początku serii
+    nie miałby do czego się odnosić po jej przesunięciu.
+    """
+    rule = parse(text)
+    if rule.count:
+        last = deque(islice(occurrences(rule, start), rule.count), maxlen=1)
+        rule = rule._replace(count=None, until=last[0] if last else start - timedelta(days=1))
+    first = next(occurrences(rule, start), None)
+    if first is None:
+        raise ValueError('Reguła powtarzania nie daje żadnego terminu.')
+    return format_rule(rule), first
+
+
+def following(text, day):
+    """Pierwsze wystąpienie po day (day jest wystąpieniem serii) albo None, gdy seria się kończy"""
+    return next(occurrences(parse(text), day, day + timedelta(days=1)), None)
+
+
+def missed(text, due_date, due_time, now):
+    """Ile wystąpień serii, licząc od bieżącego (due_date), ma termin przed now - dni są wyliczane aż do now"""
+    count = 0
+    for day in occurrences(parse(text), due_date):
+        if datetime.combine(day, due_time) >= now:
+            break
+        count += 1
+    return count
+
+
+def describe(text):
+    """Opis reguły dla ludzi - nazwa gotowej reguły albo sama reguła"""
+    return dict(PRESETS).get(text, text)
@@ -0,0 +1,146 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from . import dashboard_cache
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# kopiec trzyma tylko przypomnienia z najbliższego okna - nowe i zmienione są dokładane przy odświeżeniu
+LOOKAHEAD = timedelta(minutes=15)
+POLL_INTERVAL = timedelta(seconds=30)
+
+
+def local_now():
+    # terminy zadań są zapisywane bez strefy czasowej, w czasie lokalnym (jak w Task.is_overdue)
+    return timezone.localtime().replace(tzinfo=None)
+
+
+def reminder_message(task):
+    due = datetime.combine(task.due_date, task.due_time)
+    return EmailMessage(
+        subject=f'Przypomnienie: {task.title}',
+        body=f'Termin zadania "{task.title}": {due:%d.%m.%Y %H:%M}.\n\n{task.description}'.strip(),
+        to=[task.author.email],
+    )
+
+
+class ReminderScheduler:
+    """Kopiec nadchodzących przypomnień (moment, id zadania) wczytywany z bazy porcjami
+
+    Worker budzi się dokładnie na najbliższe przypomnienie albo na kolejne odświeżenie kopca, wysyła zaległe
+    przypomnienia paczkami przez EMAIL_BACKEND i oznacza je reminder_sent_at - wysłane wypadają z indeksu
+    częściowego task_pending_reminder_idx, więc nie są ani wysyłane ponownie, ani ponownie czytane.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, lookahead=LOOKAHEAD, poll_interval=POLL_INTERVAL, clock=local_now, sleep=None):
+        self.batch_size = batch_size
+        self.lookahead = lookahead
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.stopped = threading.Event()
+        self.sleep = sleep or self.stopped.wait
+        self.heap = []
+        # aktualny moment każdego zadania w kopcu - wpisy nieaktualne po zmianie przypomnienia są pomijane
+        self.scheduled = {}
+        self.next_refresh = None
+        self.report = {'sent': 0, 'without_email': 0}
+
+    def refresh(self, now):
+        """Dokłada do kopca czekające przypomnienia aż do now + lookahead (keyset po terminie)"""
+        horizon = now + self.lookahead
+        pending = Task.objects.pending_reminders().filter(reminder_date__lte=horizon.date())
+        pending = pending.order_by('reminder_date', 'reminder_time', 'id')
+        position = None
+        while True:
+            batch = pending
+            if position:
+                day, hour, pk = position
+                batch = batch.filter(
+                    Q(reminder_date__gt=day) |
+                    Q(reminder_date=day, reminder_time__gt=hour) |
+                    Q(reminder_date=day, reminder_time=hour, id__gt=pk)
+                )
+            rows = list(batch.values_list('reminder_date', 'reminder_time', 'id')[:self.batch_size])
+            for day, hour, pk in rows:
+                moment = datetime.combine(day, hour)
+                if moment > horizon:
+                    break
+                if self.scheduled.get(pk) != moment:
+                    self.scheduled[pk] = moment
+                    heapq.heappush(self.heap, (moment, pk))
+            else:
+                if len(rows) == self.batch_size:
+                    position = rows[-1]
+                    continue
+            break
+        self.next_refresh = now + self.poll_interval
+
+    def due(self, now):
+        """Zdejmuje z kopca przypomnienia, których moment już nadszedł - [(id zadania, moment)]"""
+        events = []
+        while self.heap and self.heap[0][0] <= now:
+            moment, pk = heapq.heappop(self.heap)
+            if self.scheduled.get(pk) == moment:
+                del self.scheduled[pk]
+                events.append((pk, moment))
+        return events
+
+    def deliver(self, events):
+        for start in range(0, len(events), self.batch_size):
+            self._deliver_batch(dict(events[start:start + self.batch_size]))
+
+    def _deliver_batch(self, moments):
+        # przypomnienie mogło zostać zmienione, ukończone albo wysłane przez inny worker od wczytania do kopca
+        ready = [
+            pk for day, hour, pk in
+            Task.objects.pending_reminders().filter(id__in=list(moments)).values_list('reminder_date', 'reminder_time', 'id')
+            if datetime.combine(day, hour) == moments[pk]
+        ]
+        if not ready:
+            return
+        sent_at = timezone.now()
+        Task.objects.pending_reminders().filter(id__in=ready).update(reminder_sent_at=sent_at)
+        tasks = list(Task.objects.filter(id__in=ready, reminder_sent_at=sent_at).select_related('author'))
+        messages = [reminder_message(task) for task in tasks if task.author.email]
+        try:
+            with get_connection() as connection:
+                connection.send_messages(messages)
+        except Exception:
+            # nic nie zostało oznaczone na stałe - kolejne odświeżenie kopca spróbuje jeszcze raz
+            Task.objects.filter(id__in=[task.pk for task in tasks], reminder_sent_at=sent_at).update(reminder_sent_at=None)
+            raise
+        for user_id in {task.author_id for task in tasks}:
+            dashboard_cache.invalidate(user_id, 'reminders')
+        self.report['sent'] += len(messages)
+        self.report['without_email'] += len(tasks) - len(messages)
+        logger.info('Wysłano %d przypomnień', len(messages))
+
+    def run_pending(self):
+        """Jeden obieg workera - zwraca liczbę sekund do najbliższego przypomnienia albo odświeżenia"""
+        now = self.clock()
+        if self.next_refresh is None or now >= self.next_refresh:
+            self.refresh(now)
+        self.deliver(self.due(now))
+        wake_at = min(self.heap[0][0], self.next_refresh) if self.heap else self.next_refresh
+        return max((wake_at - self.clock()).total_seconds(), 0)
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                delay = self.run_pending()
+            except Exception:
+                logger.exception('Nie udało się wysłać przypomnień')
+                delay = self.poll_interval.total_seconds()
+            self.sleep(delay)
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,107 @@
+import functools
+import importlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+
+JSONBackend = namedtuple('JSONBackend', ['name', 'dumps', 'loads', 'errors'])
+# kolejność wyboru dla API_JSON_BACKEND = 'auto' - biblioteka standardowa (json) zawsze jest na końcu
+AUTO_ORDER = ('orjson', 'msgspec')
+# typy spoza JSON (leniwe tłumaczenia, Decimal, QuerySet...) zamieniamy tak samo jak JSONRenderer z DRF
+_default = encoders.JSONEncoder().default
+
+
+def _orjson():
+    orjson = importlib.import_module('orjson')
+    # daty i godziny kodowane natywnie jak isoformat(), strefa UTC jako "Z" - tak jak w koderze DRF
+    option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    return JSONBackend(
+        'orjson', lambda data: orjson.dumps(data, default=_default, option=option), orjson.loads, (orjson.JSONDecodeError,)
+    )
+
+
+def _msgspec_default(obj):
+    # podklasy str, int i float (np. ErrorDetail z DRF) msgspec przekazuje do enc_hook, zamiast kodować je jak typ bazowy
+    for base in (str, int, float):
+        if isinstance(obj, base):
+            return base(obj)
+    return _default(obj)
+
+
+def _msgspec():
+    msgspec = importlib.import_module('msgspec')
+    # Decimal jako liczba, jak float(Decimal) w DRF (msgspec domyślnie pisze go jako napis); zapis zachowuje
+    # cyfry wartości (1.10, nie 1.1) - serializery i tak zwracają Decimal jako napis (COERCE_DECIMAL_TO_STRING)
+    encoder = msgspec.json.Encoder(enc_hook=_msgspec_default, decimal_format='number')
+    return JSONBackend('msgspec', encoder.encode, msgspec.json.Decoder().decode, (msgspec.DecodeError,))
+
+
+LOADERS = {
+    'orjson': _orjson,
+    'msgspec': _msgspec,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_backend(name):
+    """Szybka biblioteka JSON o podanej nazwie - None oznacza json z biblioteki standardowej"""
+    if name == 'json':
+        return None
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            try:
+                return LOADERS[candidate]()
+            except ImportError:
+                continue
+        return None
+    if name not in LOADERS:
+        raise ImproperlyConfigured(f'Nieznany API_JSON_BACKEND "{name}" - dostępne: auto, json, {", ".join(LOADERS)}.')
+    try:
+        return LOADERS[name]()
+    except ImportError as exc:
+        raise ImproperlyConfigured(f'API_JSON_BACKEND = "{name}", ale biblioteka nie jest zainstalowana.') from exc
+
+
+def get_backend():
+    return load_backend(getattr(settings, 'API_JSON_BACKEND', 'auto'))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer kodujący przez orjson albo msgspec - wynik identyczny z DRF dla danych z serializerów
+
+    Wcięcia (Browsable API, "Accept: application/json; indent=4") i ustawienia UNICODE_JSON/COMPACT_JSON
+    inne niż domyślne obsługuje zwykły JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        backend = get_backend()
+        if (
+            data is None or backend is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = backend.dumps(data)
+        # DRF zamienia separatory wierszy na sekwencje ucieczki, żeby JSON był też poprawnym JavaScriptem
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser dekodujący przez orjson albo msgspec - treść w innym kodowaniu niż UTF-8 czyta DRF"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        backend = get_backend()
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if backend is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return backend.loads(stream.read())
+        except backend.errors as exc:
+            raise ParseError(f'JSON parse error - {exc}')
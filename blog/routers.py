@@ -0,0 +1,131 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+# tylko dane aplikacji - sesje i użytkownicy są czytani z bazy głównej, zanim widok w ogóle ruszy
+ROUTED_APPS = {'blog'}
+# wersja danych (blog.versions) z ETag i Last-Modified musi pochodzić z tej samej bazy co treść odpowiedzi
+ROUTED_MODELS = {'accounts.profile'}
+STICKY_COOKIE = 'db_primary'
+
+
+class _RequestState:
+    def __init__(self):
+        self.read_alias = None
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('replica_request', default=None)
+
+
+def replica_reads(view):
+    """Oznacza widok (funkcję albo klasę) tylko do odczytu - jego zapytania mogą iść do repliki (ReplicaMiddleware)"""
+    view.replica_reads = True
+    return view
+
+
+def reads_from_replica(view):
+    return getattr(view, 'replica_reads', False) or getattr(getattr(view, 'view_class', None), 'replica_reads', False)
+
+
+@contextmanager
+def primary_reads():
+    """Odczyty w bloku idą do bazy głównej także w widoku @replica_reads - dla danych zapamiętywanych w cache"""
+    state = _state.get()
+    alias = state.read_alias if state is not None else None
+    if alias:
+        state.read_alias = None
+    try:
+        yield
+    finally:
+        if alias and not state.wrote:
+            state.read_alias = alias
+
+
+def _routed(model):
+    return model._meta.app_label in ROUTED_APPS or model._meta.label_lower in ROUTED_MODELS
+
+
+class ReplicaRouter:
+    """Zapisy zawsze do 'default'; odczyty modeli blog i wersji danych w żądaniach widoków @replica_reads do repliki
+
+    Poza takim żądaniem (polecenia, worker przypomnień, testy) wszystko idzie do bazy głównej.
+    Pierwszy zapis w żądaniu przełącza jego dalsze odczyty z powrotem na bazę główną.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.read_alias and _routed(model):
+            return state.read_alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and _routed(model):
+            state.read_alias = None
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replika to kopia bazy głównej - obiekty z obu mogą się do siebie odwoływać
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """Wybiera replikę dla GET/HEAD widoków @replica_reads i pilnuje odczytu własnych zapisów
+
+    Po żądaniu, które coś zapisało, klient dostaje ciasteczko STICKY_COOKIE na DATABASE_REPLICA_STICKY_SECONDS -
+    do tego czasu jego odczyty idą do bazy głównej, więc nie zobaczy stanu sprzed własnej zmiany.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RequestState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state = _RequestState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        state = _state.get()
+        if (
+            replicas and state is not None and request.method in ('GET', 'HEAD')
+            and reads_from_replica(view_func) and STICKY_COOKIE not in request.COOKIES
+        ):
+            state.read_alias = random.choice(replicas)
+        return None
+
+    def pin(self, state, response):
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.DATABASE_REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
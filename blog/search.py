@@ -0,0 +1,175 @@
+import re
+from abc import ABC, abstractmethod
+
+from django.db import connection as default_connection
+from django.db.models import F, FloatField, Func, Q, Value
+
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    """Dzieli zapytanie użytkownika na słowa - wszystko poza literami i cyframi jest pomijane"""
+    return [term.lower() for term in WORD_RE.findall(query)]
+
+
+class LikeSearchBackend:
+    """Dotychczasowe wyszukiwanie icontains - używane dla baz bez indeksu pełnotekstowego"""
+    ordering = None
+
+    def __init__(self, connection=None):
+        self.connection = connection or default_connection
+
+    def install(self):
+        pass
+
+    def uninstall(self):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def index_tasks(self, task_ids):
+        pass
+
+    def remove_tasks(self, task_ids):
+        pass
+
+    def search(self, queryset, user, query):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(tags__name__icontains=query) |
+            Q(category__name__icontains=query)
+        ).distinct()
+
+
+class FullTextSearchBackend(LikeSearchBackend, ABC):
+    """Wspólna część indeksów pełnotekstowych: tabela dokumentów (zadanie -> tytuł, opis, tagi, kategoria)"""
+    # wynik jest sortowany po trafności, a remisy po id - taki porządek obsługuje też paginacja kursorowa
+    ordering = ('search_rank', 'id')
+    document_select = None
+
+    @abstractmethod
+    def build_query(self, terms, user):
+        """Wyrażenie dopasowania dla bazy (MATCH w FTS5, tsquery w PostgreSQL) ze słów zapytania"""
+
+    @abstractmethod
+    def filter_matching(self, queryset, user, expression):
+        """Zawęża zadania do dopasowanych i dodaje adnotację search_rank"""
+
+    def execute(self, sql, params=()):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _placeholders(self, ids):
+        return ', '.join(['%s'] * len(ids))
+
+    def rebuild(self):
+        self.execute(f'DELETE FROM {self.table}')
+        self.execute(self.insert_sql + self.document_select)
+
+    def index_tasks(self, task_ids):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return
+        self.remove_tasks(task_ids)
+        self.execute(
+            self.insert_sql + self.document_select + f' WHERE t.id IN ({self._placeholders(task_ids)})', task_ids
+        )
+
+    def remove_tasks(self, task_ids):
+        task_ids = list(task_ids)
+        if task_ids:
+            self.execute(f'DELETE FROM {self.table} WHERE {self.key} IN ({self._placeholders(task_ids)})', task_ids)
+
+    def search(self, queryset, user, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        return self.filter_matching(queryset, user, self.build_query(terms, user))
+
+
+class SqliteSearchBackend(FullTextSearchBackend):
+    """Wirtualna tabela FTS5 z rowid równym id zadania, dopasowaniem prefiksów i bez polskich znaków diakrytycznych"""
+    table = 'blog_task_fts'
+    key = 'rowid'
+    insert_sql = 'INSERT INTO blog_task_fts (rowid, author, title, description, tags, category) '
+    document_select = (
+        "SELECT t.id, 'u' || t.author_id, t.title, t.description, "
+        "COALESCE((SELECT group_concat(g.name, ' ') FROM blog_task_tags tt "
+        "JOIN blog_tag g ON g.id = tt.tag_id WHERE tt.task_id = t.id), ''), "
+        "COALESCE(c.name, '') "
+        "FROM blog_task t LEFT JOIN blog_category c ON c.id = t.category_id"
+    )
+
+    def install(self):
+        self.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS blog_task_fts USING fts5("
+            "author, title, description, tags, category, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        # waga kolumn bm25: autor (tylko filtr), tytuł, opis, tagi, kategoria
+        self.execute("INSERT INTO blog_task_fts (blog_task_fts, rank) VALUES ('rank', 'bm25(0.0, 10.0, 1.0, 5.0, 5.0)')")
+
+    def uninstall(self):
+        self.execute('DROP TABLE IF EXISTS blog_task_fts')
+
+    def build_query(self, terms, user):
+        words = ' AND '.join(f'"{term}"*' for term in terms)
+        return f'author : "u{user.pk}" AND {{title description tags category}} : ({words})'
+
+    def filter_matching(self, queryset, user, expression):
+        # złączenie z tabelą FTS5 - rank (bm25, im mniejszy tym lepiej) liczony raz dla każdego dopasowania
+        return queryset.filter(fts_entry__document__match=expression).annotate(search_rank=F('fts_entry__rank'))
+
+
+class PostgresSearchBackend(FullTextSearchBackend):
+    """Tabela z kolumną tsvector (indeks GIN) - tytuł ma wagę A, tagi i kategoria B, opis C"""
+    table = 'blog_task_search'
+    key = 'task_id'
+    ordering = ('-search_rank', 'id')
+    insert_sql = 'INSERT INTO blog_task_search (task_id, author_id, document) '
+    document_select = (
+        "SELECT t.id, t.author_id, "
+        "setweight(to_tsvector('simple', t.title), 'A') || "
+        "setweight(to_tsvector('simple', COALESCE((SELECT string_agg(g.name, ' ') FROM blog_task_tags tt "
+        "JOIN blog_tag g ON g.id = tt.tag_id WHERE tt.task_id = t.id), '') || ' ' || COALESCE(c.name, '')), 'B') || "
+        "setweight(to_tsvector('simple', t.description), 'C') "
+        "FROM blog_task t LEFT JOIN blog_category c ON c.id = t.category_id"
+    )
+
+    def install(self):
+        self.execute(
+            'CREATE TABLE IF NOT EXISTS blog_task_search ('
+            'task_id bigint PRIMARY KEY REFERENCES blog_task (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'author_id integer NOT NULL, document tsvector NOT NULL)'
+        )
+        self.execute('CREATE INDEX IF NOT EXISTS blog_task_search_document_idx ON blog_task_search USING GIN (document)')
+        self.execute('CREATE INDEX IF NOT EXISTS blog_task_search_author_idx ON blog_task_search (author_id)')
+
+    def uninstall(self):
+        self.execute('DROP TABLE IF EXISTS blog_task_search')
+
+    def build_query(self, terms, user):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def filter_matching(self, queryset, user, expression):
+        tsquery = Func(Value(expression), function='to_tsquery', template="%(function)s('simple', %(expressions)s)")
+        return queryset.filter(
+            search_document__author_id=user.pk, search_document__document__match=expression
+        ).annotate(
+            search_rank=Func(F('search_document__document'), tsquery, function='ts_rank', output_field=FloatField())
+        )
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(connection=None):
+    """Backend wyszukiwania odpowiedni dla silnika bazy danych"""
+    connection = connection or default_connection
+    return BACKENDS.get(connection.vendor, LikeSearchBackend)(connection)
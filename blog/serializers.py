@@ -1,4 +1,10 @@
-from rest_framework import serializers
+import functools
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from . import recurrence
 from .models import Task, Category, Tag
 
 
@@ -8,6 +14,17 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'color']
 
 
+class CategoryStatsSerializer(serializers.ModelSerializer):
+    task_count = serializers.IntegerField(read_only=True)
+    active_count = serializers.IntegerField(read_only=True)
+    completed_count = serializers.IntegerField(read_only=True)
+    overdue_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'color', 'task_count', 'active_count', 'completed_count', 'overdue_count']
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -22,6 +39,144 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = [
             'id', 'title', 'description', 'due_date', 'due_time',
-            'reminder_date', 'reminder_time', 'priority', 'is_completed',
-            'created_date', 'category', 'tags'
+            'reminder_date', 'reminder_time', 'priority', 'is_completed', 'recurrence',
+            'created_date', 'updated_at', 'category', 'tags'
         ]
+
+
+class SyncTaskSerializer(serializers.ModelSerializer):
+    """Zadanie w odpowiedzi /api/sync/ - kategoria i tagi jako id, bo klient synchronizuje je osobno"""
+    category = serializers.PrimaryKeyRelatedField(read_only=True)
+    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Task
+        fields = TaskSerializer.Meta.fields
+
+
+class TaskWriteSerializer(serializers.ModelSerializer):
+    """Pola zadania przyjmowane przez operacje masowe - kategoria i tagi jako id, sprawdzane poza serializerem"""
+    category = serializers.IntegerField(required=False, allow_null=True)
+    tags = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    class Meta:
+        model = Task
+        fields = [
+            'title', 'description', 'due_date', 'due_time', 'reminder_date', 'reminder_time',
+            'priority', 'is_completed', 'recurrence', 'category', 'tags'
+        ]
+
+    def validate(self, attrs):
+        reminder_date = attrs.get('reminder_date', getattr(self.instance, 'reminder_date', None))
+        reminder_time = attrs.get('reminder_time', getattr(self.instance, 'reminder_time', None))
+        due_date = attrs.get('due_date', getattr(self.instance, 'due_date', None))
+        if reminder_date and not reminder_time:
+            raise serializers.ValidationError('Podaj godzinę przypomnienia.')
+        if reminder_time and not reminder_date:
+            raise serializers.ValidationError('Podaj datę przypomnienia.')
+        if reminder_date and due_date and reminder_date > due_date:
+            raise serializers.ValidationError('Przypomnienie musi być przed terminem wykonania.')
+        rule = attrs.get('recurrence', getattr(self.instance, 'recurrence', ''))
+        if rule and due_date and {'recurrence', 'due_date'} & set(attrs):
+            try:
+                attrs['recurrence'], attrs['due_date'] = recurrence.normalize(rule, due_date)
+            except ValueError as exc:
+                raise serializers.ValidationError({'recurrence': str(exc)})
+        return attrs
+
+
+def _iso_datetime(value):
+    # to samo co DateTimeField.to_representation dla ISO 8601 przy USE_TZ: strefa bieżąca, "+00:00" jako "Z"
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _converter(field):
+    """Konwersja wartości z .values() dająca wynik field.to_representation - None gdy wartość przechodzi bez zmian"""
+    if isinstance(field, serializers.DateTimeField):
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601 and settings.USE_TZ:
+            return _iso_datetime
+    elif isinstance(field, serializers.DateField):
+        if getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+            return _isoformat
+    elif isinstance(field, serializers.TimeField):
+        if getattr(field, 'format', api_settings.TIME_FORMAT) == ISO_8601:
+            return _isoformat
+    elif isinstance(field, serializers.ChoiceField):
+        if all(str(key) == key for key in field.choices):
+            return None
+    elif type(field) in (serializers.IntegerField, serializers.CharField, serializers.BooleanField):
+        return None
+    return field.to_representation
+
+
+def _accessors(serializer, prefix=''):
+    """[(klucz w wyniku, klucz w wierszu .values(), konwersja)] dla prostych pól serializera"""
+    return [
+        (name, prefix + field.source, _converter(field))
+        for name, field in serializer.fields.items()
+        if not isinstance(field, serializers.BaseSerializer)
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _task_layout():
+    task = TaskSerializer()
+    category = task.fields['category']
+    tags = task.fields['tags'].child
+    return {
+        'order': list(task.fields),
+        'task': _accessors(task),
+        'category': _accessors(category, 'category__'),
+        'tag': _accessors(tags, 'tag__'),
+    }
+
+
+def task_values(queryset):
+    """Zadania jako wiersze .values() z kolumnami potrzebnymi do fast_task_data (kategoria przez LEFT JOIN)"""
+    layout = _task_layout()
+    return queryset.values(*[source for _, source, _ in layout['task'] + layout['category']])
+
+
+def _convert(row, accessors):
+    return {name: None if row[source] is None else convert(row[source]) if convert else row[source]
+            for name, source, convert in accessors}
+
+
+def _tag_links(rows):
+    """Tagi zadań z wierszy jednym zapytaniem w porządku Tag.Meta.ordering, tak jak prefetch_related"""
+    tag_sources = [source for _, source, _ in _task_layout()['tag']]
+    return Task.tags.through.objects.filter(task_id__in=[row['id'] for row in rows]).order_by(
+        *[f'tag__{field}' for field in Tag._meta.ordering]
+    ).values('task_id', *tag_sources)
+
+
+def _assemble(rows, links):
+    layout = _task_layout()
+    tags = {}
+    for link in links:
+        tags.setdefault(link['task_id'], []).append(_convert(link, layout['tag']))
+    data = []
+    for row in rows:
+        task = _convert(row, layout['task'])
+        task['category'] = _convert(row, layout['category']) if row['category__id'] is not None else None
+        task['tags'] = tags.get(row['id'], [])
+        data.append({name: task[name] for name in layout['order']})
+    return data
+
+
+def fast_task_data(rows):
+    """Wynik TaskSerializer(many=True).data dla wierszy task_values() - bez instancji modeli i pól DRF
+
+    Zgodność z TaskSerializer (bajt w bajt po renderowaniu) pilnuje test.
+    """
+    return _assemble(rows, _tag_links(rows) if rows else [])
+
+
+async def afast_task_data(rows):
+    """fast_task_data dla widoków asynchronicznych"""
+    return _assemble(rows, [link async for link in _tag_links(rows)] if rows else [])
@@ -0,0 +1,245 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Profile
+
+from . import changelog, dashboard_cache, stats, versions
+from .models import CategoryStats, ChangeLogEntry, Task, TaskStats, Category, Tag
+from .search import get_backend
+
+
+_suspended = ContextVar('blog_signals_suspended', default=False)
+
+
+@contextmanager
+def suspended():
+    """Wyłącza obsługę sygnałów na czas operacji masowych - wywołujący kończy je przez sync_tasks()"""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def unless_suspended(handler):
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not _suspended.get():
+            return handler(*args, **kwargs)
+    return wrapper
+
+
+def owner_deleted(origin):
+    """Usuwanie zaczęło się od użytkownika (User.delete(), akcja w adminie) - jego dziennik znika razem z nim
+
+    Nagrobki zapisane w trakcie kaskady wskazywałyby na usuwanego użytkownika i łamały klucz obcy.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, User)
+
+
+def data_changed(user_id, *fragments):
+    """Unieważnia fragmenty strony głównej (domyślnie wszystkie) i podbija wersję danych użytkownika dla API
+
+    Cache leży poza bazą, więc fragmenty znikają dopiero po COMMIT - usunięte wcześniej mógłby od razu zapisać
+    z powrotem równoległy odczyt, który widzi jeszcze stan sprzed transakcji.
+    """
+    transaction.on_commit(lambda: dashboard_cache.invalidate(user_id, *fragments))
+    versions.bump(user_id)
+
+
+def sync_tasks(user_id, changed_ids=(), removed_ids=(), before=None):
+    """Jednorazowa aktualizacja indeksu wyszukiwania, dziennika zmian, liczników i cache po masowej zmianie zadań użytkownika
+
+    before to stany zadań sprzed zmiany (stats.states() zmienianych i usuwanych, {} przy samym tworzeniu) -
+    bez nich liczniki użytkownika są liczone od nowa.
+    """
+    backend = get_backend()
+    backend.remove_tasks(removed_ids)
+    backend.index_tasks(changed_ids)
+    changelog.record(user_id, ChangeLogEntry.TASK, changed_ids)
+    changelog.record(user_id, ChangeLogEntry.TASK, removed_ids, deleted=True)
+    if before is None:
+        stats.recount_user(user_id)
+    else:
+        stats.apply(before.values(), stats.states(changed_ids).values())
+    data_changed(user_id)
+
+
+def retagged_task_ids(instance, action, reverse, pk_set):
+    """Zadania, których tagi zmieniły się w danym m2m_changed (None dla akcji, które nic nie zmieniają)"""
+    if reverse and action == 'pre_clear':
+        # po wyczyszczeniu relacji z poziomu tagu nie wiadomo już, których zadań dotyczyła
+        instance._search_task_ids = list(instance.tasks.values_list('pk', flat=True))
+        return None
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return None
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, '_search_task_ids', [])
+    return list(pk_set)
+
+
+@receiver(post_save, sender=Task)
+@unless_suspended
+def index_saved_task(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index_tasks([instance.pk])
+
+
+@receiver(post_delete, sender=Task)
+@unless_suspended
+def remove_deleted_task(sender, instance, **kwargs):
+    get_backend().remove_tasks([instance.pk])
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+@unless_suspended
+def index_retagged_tasks(sender, instance, action, reverse, pk_set, **kwargs):
+    task_ids = retagged_task_ids(instance, action, reverse, pk_set)
+    if task_ids is not None:
+        get_backend().index_tasks(task_ids)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@unless_suspended
+def index_renamed_label(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        get_backend().index_tasks(instance.tasks.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+@unless_suspended
+def remember_labelled_tasks(sender, instance, **kwargs):
+    instance._search_task_ids = list(instance.tasks.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+@unless_suspended
+def index_unlabelled_tasks(sender, instance, **kwargs):
+    get_backend().index_tasks(getattr(instance, '_search_task_ids', []))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@unless_suspended
+def invalidate_task_fragments(sender, instance, **kwargs):
+    data_changed(instance.author_id, 'tasks', 'reminders')
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+@unless_suspended
+def invalidate_retagged_fragments(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        data_changed(instance.author_id, 'tasks')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@unless_suspended
+def invalidate_tag_fragments(sender, instance, **kwargs):
+    # zadania we fragmencie "tasks" mają wczytane tagi
+    data_changed(instance.author_id, 'tasks')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@unless_suspended
+def invalidate_category_fragments(sender, instance, **kwargs):
+    # zadania we fragmencie "tasks" mają wczytaną kategorię
+    data_changed(instance.author_id, 'categories', 'tasks')
+
+
+@receiver(post_save, sender=Task)
+@unless_suspended
+def log_saved_task(sender, instance, **kwargs):
+    changelog.record(instance.author_id, ChangeLogEntry.TASK, [instance.pk])
+
+
+@receiver(post_delete, sender=Task)
+@unless_suspended
+def log_deleted_task(sender, instance, origin=None, **kwargs):
+    if owner_deleted(origin):
+        return
+    changelog.record(instance.author_id, ChangeLogEntry.TASK, [instance.pk], deleted=True)
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+@unless_suspended
+def log_retagged_tasks(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('post_'):
+        task_ids = retagged_task_ids(instance, action, reverse, pk_set)
+        changelog.record(instance.author_id, ChangeLogEntry.TASK, task_ids or [])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@unless_suspended
+def log_saved_label(sender, instance, **kwargs):
+    changelog.record(instance.author_id, sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+@unless_suspended
+def log_deleted_label(sender, instance, origin=None, **kwargs):
+    if owner_deleted(origin):
+        return
+    changelog.record(instance.author_id, sender._meta.model_name, [instance.pk], deleted=True)
+    # usunięcie kategorii (SET_NULL) albo tagu zmienia też zadania, choć nie wysyła dla nich sygnałów
+    changelog.record(instance.author_id, ChangeLogEntry.TASK, getattr(instance, '_search_task_ids', []))
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        TaskStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    # profil trzyma wersję danych (blog.versions) - musi istnieć, zanim użytkownik cokolwiek zapisze
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Category)
+def create_category_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CategoryStats.objects.get_or_create(category=instance)
+
+
+@receiver(pre_save, sender=Task)
+@unless_suspended
+def remember_counted_state(sender, instance, raw=False, **kwargs):
+    # stan z chwili wczytania może być nieaktualny (dwa przełączenia tego samego zadania, stary obiekt w adminie) -
+    # różnica w licznikach liczona jest od wiersza zablokowanego w transakcji zapisu (Task.save)
+    if not raw and not instance._state.adding:
+        instance._counted_state = stats.states([instance.pk], lock=True).get(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+@unless_suspended
+def count_saved_task(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = None if created else getattr(instance, '_counted_state', None)
+    instance._counted_state = stats.counted_state(instance)
+    stats.apply([before] if before else [], [instance._counted_state])
+
+
+@receiver(post_delete, sender=Task)
+@unless_suspended
+def count_deleted_task(sender, instance, **kwargs):
+    stats.apply([getattr(instance, '_counted_state', None) or stats.counted_state(instance)])
@@ -0,0 +1,108 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Task, Category, CategoryStats, TaskStats, overdue_q
+
+
+def counted_state(task):
+    """(autor, kategoria, ukończone) - to, co o zadaniu wiedzą liczniki"""
+    return tuple(getattr(task, field) for field in Task.COUNTED_FIELDS)
+
+
+def states(task_ids, lock=False):
+    """Stan zadań w licznikach wczytany z bazy - {id: (autor, kategoria, ukończone)}
+
+    lock blokuje wiersze (SELECT ... FOR UPDATE) do końca transakcji - stan nie zmieni się przed zapisem.
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return {}
+    tasks = Task.objects.filter(pk__in=task_ids)
+    if lock:
+        tasks = tasks.select_for_update()
+    return {pk: tuple(state) for pk, *state in tasks.values_list('pk', *Task.COUNTED_FIELDS)}
+
+
+def _deltas(before, after):
+    deltas = defaultdict(lambda: [0, 0])
+    for task_states, sign in ((before, -1), (after, 1)):
+        for author_id, category_id, completed in task_states:
+            for model, pk in ((TaskStats, author_id), (CategoryStats, category_id)):
+                if pk is not None:
+                    deltas[model, pk][0] += sign
+                    deltas[model, pk][1] += sign if completed else 0
+    return {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+
+
+def apply(before=(), after=()):
+    """Przenosi zadania w licznikach ze stanów before (sprzed zmiany) do after (po zmianie) - jedno UPDATE na licznik
+
+    Brak wiersza oznacza usuniętego właściciela albo licznik jeszcze niepoliczony - takie zmiany są pomijane,
+    a for_user() policzy licznik od nowa przy pierwszym odczycie.
+    """
+    for (model, pk), (total, completed) in _deltas(before, after).items():
+        model.objects.filter(pk=pk).update(total=F('total') + total, completed=F('completed') + completed)
+
+
+def recount_user(user_id):
+    """Liczy od nowa liczniki użytkownika i jego kategorii - po operacjach masowych i w recompute_task_stats"""
+    counts = Task.objects.filter(author_id=user_id).aggregate(
+        total=Count('pk'), completed=Count('pk', filter=Q(is_completed=True))
+    )
+    user_stats, _ = TaskStats.objects.update_or_create(user_id=user_id, defaults=counts)
+    CategoryStats.objects.bulk_create(
+        [
+            CategoryStats(category_id=pk, total=total, completed=completed)
+            for pk, total, completed in Category.objects.filter(author_id=user_id).order_by().annotate(
+                total=Count('tasks'), completed=Count('tasks', filter=Q(tasks__is_completed=True))
+            ).values_list('pk', 'total', 'completed')
+        ],
+        update_conflicts=True, unique_fields=['category'], update_fields=['total', 'completed'],
+    )
+    return user_stats
+
+
+def for_user(user, now=None):
+    """Liczniki zadań użytkownika - wszystkie/aktywne/ukończone z TaskStats, po terminie i na dziś z indeksu aktywnych
+
+    "Po terminie" zależy od bieżącej godziny, więc nie da się go utrzymywać przy zapisie - liczymy tylko aktywne
+    zadania z terminem do dziś, zakresem indeksu task_author_listing_idx.
+    """
+    now = now or timezone.localtime()
+    user_stats = TaskStats.objects.filter(user=user).first() or recount_user(user.pk)
+    due = Task.objects.filter(author=user, is_completed=False, due_date__lte=now.date()).aggregate(
+        overdue=Count('pk', filter=overdue_q(now)), due_today=Count('pk', filter=Q(due_date=now.date()))
+    )
+    return {
+        'total': user_stats.total,
+        'active': user_stats.active,
+        'completed': user_stats.completed,
+        **due,
+    }
+
+
+def check(users):
+    """Liczniki niezgodne z tabelą zadań - [(model, pk, id użytkownika, zapisane (total, completed), policzone)]"""
+    users = list(users)
+    actual, owners = defaultdict(lambda: (0, 0)), {}
+    for user in users:
+        owners[TaskStats, user.pk] = user.pk
+    for author_id, total, completed in Task.objects.filter(author__in=users).order_by().values('author').annotate(
+        total=Count('pk'), completed=Count('pk', filter=Q(is_completed=True))
+    ).values_list('author', 'total', 'completed'):
+        actual[TaskStats, author_id] = (total, completed)
+    for pk, author_id, total, completed in Category.objects.filter(author__in=users).order_by().annotate(
+        total=Count('tasks'), completed=Count('tasks', filter=Q(tasks__is_completed=True))
+    ).values_list('pk', 'author', 'total', 'completed'):
+        owners[CategoryStats, pk] = author_id
+        actual[CategoryStats, pk] = (total, completed)
+    stored = {(TaskStats, pk): (total, completed) for pk, total, completed in TaskStats.objects.filter(
+        user__in=users).values_list('pk', 'total', 'completed')}
+    stored.update({(CategoryStats, pk): (total, completed) for pk, total, completed in CategoryStats.objects.filter(
+        category__author__in=users).values_list('pk', 'total', 'completed')})
+    return [
+        (model, pk, user_id, stored.get((model, pk)), actual[model, pk])
+        for (model, pk), user_id in owners.items() if stored.get((model, pk)) != actual[model, pk]
+    ]
@@ -0,0 +1,27 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+
+# tyle kawałków na jedno przejście do wątku - mniej przełączeń, a w pamięci nadal tylko bieżąca porcja
+CHUNKS_PER_STEP = 64
+
+
+class StreamingResponse(StreamingHttpResponse):
+    """StreamingHttpResponse z synchronicznym generatorem, który także pod ASGI jest wysyłany porcjami
+
+    Django 4.2 pod ASGI czyta synchroniczny iterator w całości (sync_to_async(list)) i dopiero potem wysyła odpowiedź.
+    Tu kolejne porcje są pobierane w wątku żądania (thread_sensitive), w którym generator otworzył kursor bazy.
+    """
+
+    async def __aiter__(self):
+        if self.is_async:
+            async for part in super().__aiter__():
+                yield part
+            return
+        parts = self.streaming_content
+        next_chunks = sync_to_async(lambda: list(islice(parts, CHUNKS_PER_STEP)), thread_sensitive=True)
+        while chunks := await next_chunks():
+            for part in chunks:
+                yield part
@@ -0,0 +1,45 @@
+import copy
+
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from WebBlogProject.databases import REPLICA_ALIAS
+
+from . import querycheck
+
+
+class QueryCheckRunner(DiscoverRunner):
+    """Runner testów z opcją --query-budgets: wykrywanie N+1 w każdym żądaniu i twarde budżety zapytań widoków"""
+
+    def __init__(self, query_budgets=False, **kwargs):
+        super().__init__(**kwargs)
+        self.query_budgets = query_budgets
+        self.budget_settings = None
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--query-budgets', action='store_true',
+            help='Wypisuje N+1 i wolne zapytania oraz oblewa testy, w których widok przekroczył swój query_budget.',
+        )
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # bez opcji testy nie wypisują ostrzeżeń, nawet jeśli QUERY_CHECK jest włączone przez DEBUG
+        # repliki z DATABASE_REPLICA_URLS nie dostają odczytów - testy routera włączają je same (override_settings)
+        self.budget_settings = override_settings(
+            QUERY_CHECK=self.query_budgets, QUERY_CHECK_ENFORCE_BUDGETS=self.query_budgets, DATABASE_REPLICAS=[]
+        )
+        self.budget_settings.enable()
+        if REPLICA_ALIAS not in connections.settings:
+            # bez DATABASE_REPLICA_URLS testy routera dostają osobną bazę testową udającą replikę
+            connections.settings[REPLICA_ALIAS] = copy.deepcopy(connections.settings['default'])
+        if self.query_budgets:
+            querycheck.install()
+
+    def teardown_test_environment(self, **kwargs):
+        if self.budget_settings is not None:
+            self.budget_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,65 @@
+import contextlib
+import functools
+import itertools
+import random
+import time
+
+from django.db import OperationalError, transaction
+
+
+WRITE_RETRIES = 3
+# odstęp przed kolejną próbą: 50 ms, 100 ms, 200 ms (±50%, żeby wątki nie wracały naraz)
+RETRY_BACKOFF = 0.05
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def is_lock_error(exc):
+    return 'database is locked' in str(exc) or 'database table is locked' in str(exc)
+
+
+def retry_on_lock(func, retries=WRITE_RETRIES, backoff=RETRY_BACKOFF, errors=(OperationalError,)):
+    """Wynik func(), powtarzanej po błędzie blokady SQLite najwyżej retries razy - inne błędy przechodzą od razu"""
+    for attempt in itertools.count():
+        try:
+            return func()
+        except errors as exc:
+            if attempt >= retries or not is_lock_error(exc):
+                raise
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+@contextlib.contextmanager
+def immediate_atomic(using=None, savepoint=True):
+    """transaction.atomic(), które na SQLite (blog.backends.sqlite3) zaczyna się od BEGIN IMMEDIATE
+
+    Zagnieżdżone w innej transakcji to zwykły punkt zapisu (albo nic przy savepoint=False); inne bazy ignorują flagę.
+    """
+    connection = transaction.get_connection(using)
+    connection.begin_immediate = not connection.in_atomic_block
+    try:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
+
+
+def write_transaction(view):
+    """Żądanie zapisu (POST, PUT, DELETE...) w jednej transakcji BEGIN IMMEDIATE, powtarzane po "database is locked"
+
+    Powtórzenie jest bezpieczne, bo wycofana transakcja nie zostawia po sobie zmian. W trwającej już transakcji
+    (np. w TestCase) błąd przechodzi dalej - wycofać można tylko całość.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+
+        def attempt():
+            with immediate_atomic():
+                return view(request, *args, **kwargs)
+
+        if transaction.get_connection().in_atomic_block:
+            return attempt()
+        return retry_on_lock(attempt)
+    return wrapper
@@ -7,13 +7,23 @@ urlpatterns = [
     path('tasks/', views.tasks, name='task-list'),
     path('tasks/<int:task_id>/', views.task_detail, name='task-detail'),
     path('tasks/create/', views.create_task, name='task-create'),
+    path('tasks/export/', views.export_tasks, name='task-export'),
     path('tasks/<int:task_id>/edit/', views.edit_task, name='task-edit'),
     path('tasks/<int:task_id>/delete/', views.delete_task, name='task-delete'),
     path('tasks/<int:task_id>/toggle/', views.toggle_task, name='task-toggle'),
+    path('tasks/<int:task_id>/skip/', views.skip_occurrence, name='task-skip'),
     path('categories/', views.categories, name='category-list'),
     path('categories/create/', views.create_category, name='category-create'),
     path('categories/<int:cat_id>/edit/', views.edit_category, name='category-edit'),
     path('categories/<int:cat_id>/delete/', views.delete_category, name='category-delete'),
     path('api/tasks/', views.TaskListAPIView.as_view(), name='api-tasks'),
+    path('api/tasks/bulk/', views.TaskBulkAPIView.as_view(), name='api-tasks-bulk'),
+    path('api/tasks/import/', views.TaskImportAPIView.as_view(), name='api-tasks-import'),
     path('api/categories/', views.CategoryListAPIView.as_view(), name='api-categories'),
+    path('api/categories/stats/', views.CategoryStatsAPIView.as_view(), name='api-category-stats'),
+    path('api/sync/', views.SyncAPIView.as_view(), name='api-sync'),
+    path('api/agenda/', views.AgendaAPIView.as_view(), name='api-agenda'),
+    path('api/agenda.ics', views.agenda_feed, name='api-agenda-feed'),
+    path('api/cache/stats/', views.DashboardCacheStatsAPIView.as_view(), name='api-cache-stats'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
@@ -0,0 +1,44 @@
+import hashlib
+
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Profile
+
+
+def bump(user_id):
+    """Nowa wersja danych użytkownika - zmienia ETag i Last-Modified odpowiedzi API
+
+    Profil powstaje razem z użytkownikiem (blog.signals); bez profilu (np. w trakcie usuwania użytkownika,
+    kiedy profil może już nie istnieć) nie ma czego podbijać - tworzenie go tu łamałoby klucz obcy.
+    """
+    if user_id is None:
+        return
+    Profile.objects.filter(user_id=user_id).update(data_version=F('data_version') + 1, data_changed_at=timezone.now())
+
+
+def current(request):
+    """(wersja, moment ostatniej zmiany) danych zalogowanego użytkownika - jedno zapytanie na żądanie"""
+    if not hasattr(request, '_data_version'):
+        row = Profile.objects.filter(user_id=request.user.pk).values_list('data_version', 'data_changed_at').first()
+        request._data_version = row or (0, None)
+    return request._data_version
+
+
+async def acurrent(request):
+    """current() dla widoków asynchronicznych - wynik zostaje w żądaniu, więc etag() i last_modified() już nie pytają bazy"""
+    if not hasattr(request, '_data_version'):
+        row = await Profile.objects.filter(user_id=request.user.pk).values_list('data_version', 'data_changed_at').afirst()
+        request._data_version = row or (0, None)
+    return request._data_version
+
+
+def etag(request, *args, **kwargs):
+    # ta sama wersja danych i ten sam adres (strona kursora, rozmiar strony, format) dają identyczną treść
+    version, _ = current(request)
+    variant = f'{request.get_full_path()}|{request.META.get("HTTP_ACCEPT", "")}'
+    return f'{version}-{hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()[:16]}'
+
+
+def last_modified(request, *args, **kwargs):
+    return current(request)[1]
@@ -1,22 +1,43 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.views import redirect_to_login
+from django.urls import reverse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
+from django.views.decorators.http import condition, require_http_methods, require_safe
+from django.utils.decorators import method_decorator
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
 from django.utils import timezone
+from django.utils.http import parse_header_parameters
 from datetime import date, datetime, timedelta
+import codecs
 
-from .models import Task, Category, Tag
+from . import agenda, changelog, dashboard_cache, export, metrics, versions
+from .models import ChangeLogEntry, Task, Category, Tag
 from .forms import TaskForm, SearchForm, CategoryForm
+from .pagination import TASK_ORDERING, TaskCursorPagination, paginate_tasks
+from .querycheck import query_budget
+from .routers import replica_reads
+from .streaming import StreamingResponse
+from .transactions import write_transaction
+from .search import get_backend as get_search_backend
 
 
+TASKS_PAGE_SIZE = 50
+
+
+# budżety zapytań (sesja i użytkownik to pierwsze dwa) sprawdza python manage.py test --query-budgets;
+# widoki @replica_reads czytają dane z repliki, jeśli jest skonfigurowana (blog.routers)
+@replica_reads
+@query_budget(5)
 def index(request):
     if request.user.is_authenticated:
-        tasks = Task.objects.filter(author=request.user, is_completed=False)[:5]
-        now = timezone.now()
-        reminders = Task.objects.filter(
-            author=request.user,
-            reminder_date__lte=now.date(),
-            is_completed=False
+        tasks = dashboard_cache.get_fragment(
+            request.user, 'tasks',
+            lambda: Task.objects.for_listing(request.user).filter(is_completed=False)[:5]
+        )
+        # przypomnienia wysyła run_reminder_worker - strona pokazuje tylko te już wysłane
+        reminders = dashboard_cache.get_fragment(
+            request.user, 'reminders', lambda: Task.objects.sent_reminders(request.user)
         )
     else:
         tasks = []
@@ -29,21 +50,18 @@ def about(request):
     return render(request, 'about.html')
 
 
-@login_required
-def tasks(request):
-    tasks = Task.objects.filter(author=request.user)
+def filtered_tasks(request):
+    """Zadania listy po wyszukiwaniu i filtrach z adresu - (queryset, porządek, część kontekstu szablonu)"""
+    tasks = Task.objects.for_listing(request.user)
+    ordering = TASK_ORDERING
     form = SearchForm(request.GET)
     if form.is_valid():
         query = form.cleaned_data['query']
         if query:
-            from django.db.models import Q
-            tasks = tasks.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(tags__name__icontains=query) |
-                Q(category__name__icontains=query)
-            ).distinct()
-    
+            backend = get_search_backend()
+            tasks = backend.search(tasks, request.user, query)
+            ordering = backend.ordering or ordering
+
     filter_type = request.GET.get('filter', 'all')
     if filter_type == 'active':
         tasks = tasks.filter(is_completed=False)
@@ -57,33 +75,57 @@ def tasks(request):
         week_end = today + timedelta(days=7)
         tasks = tasks.filter(due_date__gte=today, due_date__lte=week_end)
     elif filter_type == 'overdue':
-        today = date.today()
-        tasks = [t for t in tasks.filter(is_completed=False) if t.is_overdue]
+        tasks = tasks.overdue()
     
     category_id = request.GET.get('category')
     if category_id:
         tasks = tasks.filter(category_id=category_id)
-    
-    categories = Category.objects.all()
-    context = {
+    return tasks, ordering, {'form': form, 'filter_type': filter_type, 'selected_category': category_id}
+
+
+def next_page_query(request, next_cursor):
+    if not next_cursor:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = next_cursor
+    return params.urlencode()
+
+
+@replica_reads
+@query_budget(5)
+@login_required
+def tasks(request):
+    tasks, ordering, context = filtered_tasks(request)
+    try:
+        tasks, next_cursor = paginate_tasks(tasks, request.GET.get('cursor'), TASKS_PAGE_SIZE, ordering)
+    except ValueError:
+        raise Http404('Niepoprawny kursor')
+
+    categories = dashboard_cache.get_fragment(
+        request.user, 'categories', lambda: Category.objects.filter(author=request.user)
+    )
+    context.update({
         'tasks': tasks,
-        'form': form,
-        'filter_type': filter_type,
         'categories': categories,
-        'selected_category': category_id
-    }
+        'next_query': next_page_query(request, next_cursor),
+    })
     return render(request, 'tasks/list.html', context=context)
 
 
+@replica_reads
+@query_budget(4)
 @login_required
 def task_detail(request, task_id):
-    task = get_object_or_404(Task, id=task_id, author=request.user)
+    task = get_object_or_404(Task.objects.for_listing(request.user), id=task_id)
     context = {'task': task}
     return render(request, 'tasks/detail.html', context)
 
 
+# zapisy formularzy w jednej transakcji BEGIN IMMEDIATE - zadanie i liczniki TaskStats/CategoryStats
+# (sygnał post_save) zapisują się razem albo wcale, a współbieżne zapisy czekają na blokadę zamiast kończyć się błędem
 @login_required
 @require_http_methods(["GET", "POST"])
+@write_transaction
 def create_task(request):
     if request.method == 'POST':
         form = TaskForm(request.POST, user=request.user)
@@ -108,6 +150,7 @@ def create_task(request):
 
 @login_required
 @require_http_methods(["GET", "POST"])
+@write_transaction
 def edit_task(request, task_id):
     task = get_object_or_404(Task, id=task_id, author=request.user)
     if task.is_completed:
@@ -130,34 +173,70 @@ def edit_task(request, task_id):
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def delete_task(request, task_id):
-    task = get_object_or_404(Task, id=task_id, author=request.user)
+    task = get_object_or_404(Task.objects.select_for_update(), id=task_id, author=request.user)
     task.delete()
     return redirect('task-list')
 
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def toggle_task(request, task_id):
-    task = get_object_or_404(Task, id=task_id, author=request.user)
-    task.is_completed = not task.is_completed
-    task.save()
+    # blokada wiersza do końca transakcji - dwa równoczesne przełączenia nie zobaczą tego samego stanu
+    task = get_object_or_404(Task.objects.select_for_update(), id=task_id, author=request.user)
+    if task.is_completed:
+        task.reopen()
+    elif task.recurrence:
+        # w serii kończy się tylko bieżące wystąpienie - termin przechodzi na następne
+        task.complete_occurrence()
+    else:
+        task.is_completed = True
+        task.save()
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return JsonResponse({'success': True, 'is_completed': task.is_completed})
+        return JsonResponse({
+            'success': True, 'is_completed': task.is_completed,
+            'recurring': bool(task.recurrence), 'due_date': task.due_date.isoformat(),
+        })
     return redirect('task-list')
 
 
+@login_required
+@require_http_methods(["POST"])
+@write_transaction
+def skip_occurrence(request, task_id):
+    task = get_object_or_404(Task.objects.select_for_update(), id=task_id, author=request.user, is_completed=False)
+    if not task.recurrence:
+        return HttpResponseBadRequest('Pominąć można tylko wystąpienie zadania cyklicznego.')
+    task.complete_occurrence(skip=True)
+    return redirect('task-detail', task_id=task.id)
+
+
+@replica_reads
+@login_required
+def export_tasks(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest('Nieobsługiwany format eksportu.')
+    generate, content_type = export.FORMATS[fmt]
+    response = StreamingResponse(generate(export.export_queryset(request.user)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="zadania.{fmt}"'
+    return response
+
+
+@replica_reads
+@query_budget(3)
 @login_required
 def categories(request):
-    cats = Category.objects.filter(author=request.user)
-    for cat in cats:
-        cat.task_count = cat.tasks.filter(author=request.user).count()
+    cats = Category.objects.filter(author=request.user).with_task_stats(request.user)
     context = {'categories': cats}
     return render(request, 'tasks/categories.html', context)
 
 
 @login_required
 @require_http_methods(["GET", "POST"])
+@write_transaction
 def create_category(request):
     if request.method == 'POST':
         form = CategoryForm(request.POST, user=request.user)
@@ -174,6 +253,7 @@ def create_category(request):
 
 @login_required
 @require_http_methods(["GET", "POST"])
+@write_transaction
 def edit_category(request, cat_id):
     category = get_object_or_404(Category, id=cat_id, author=request.user)
     if request.method == 'POST':
@@ -189,28 +269,204 @@ def edit_category(request, cat_id):
 
 @login_required
 @require_http_methods(["POST"])
+@write_transaction
 def delete_category(request, cat_id):
     category = get_object_or_404(Category, id=cat_id, author=request.user)
     category.delete()
     return redirect('category-list')
 
 
+@staff_member_required
+def metrics_view(request):
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
-from .serializers import TaskSerializer, CategorySerializer
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .bulk import BulkTaskOperations
+from .importer import CONTENT_TYPES, READERS, TaskImporter
+from .serializers import (
+    TaskSerializer, CategorySerializer, CategoryStatsSerializer, SyncTaskSerializer, TagSerializer,
+    fast_task_data, task_values,
+)
+
 
+# 304 Not Modified jest zwracane przed zapytaniem o listę i serializacją - wystarcza wersja danych użytkownika
+conditional_get = method_decorator(condition(etag_func=versions.etag, last_modified_func=versions.last_modified), name='get')
 
+
+@replica_reads
+@query_budget(5)
+@conditional_get
 class TaskListAPIView(generics.ListAPIView):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TaskCursorPagination
 
     def get_queryset(self):
-        return Task.objects.filter(author=self.request.user)
+        return Task.objects.for_listing(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        # szybka ścieżka odczytu: wiersze .values() zamiast instancji i pól DRF, wynik identyczny z TaskSerializer
+        rows = self.paginate_queryset(task_values(Task.objects.filter(author=request.user)))
+        return self.get_paginated_response(fast_task_data(rows))
 
 
+@method_decorator(write_transaction, name='post')
+class TaskBulkAPIView(APIView):
+    """POST {"create": [...], "update": [...], "complete": [id, ...], "delete": [id, ...]} - wszystko albo nic"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        operations = BulkTaskOperations(request.user, request.data)
+        if not operations.validate():
+            return Response(operations.results, status=400)
+        return Response(operations.execute())
+
+
+@method_decorator(write_transaction, name='post')
+class TaskImportAPIView(APIView):
+    """POST z treścią text/csv albo application/x-ndjson (układ jak w eksporcie) - czytane strumieniowo"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # nagłówek z parametrami, np. "text/csv; charset=utf-8"
+        media_type, params = parse_header_parameters(request.content_type or '')
+        fmt = CONTENT_TYPES.get(media_type.lower())
+        encoding = params.get('charset', 'utf-8')
+        try:
+            # utf-8-sig pomija znacznik BOM, który dokładają niektóre arkusze kalkulacyjne
+            encoding = 'utf-8-sig' if codecs.lookup(encoding).name == 'utf-8' else encoding
+        except LookupError:
+            fmt = None
+        if fmt is None:
+            raise UnsupportedMediaType(request.content_type)
+        # treść nie przechodzi przez parsery DRF - wiersze są czytane wprost ze strumienia żądania
+        lines = codecs.iterdecode(request.stream or [], encoding)
+        return Response(TaskImporter(request.user).import_rows(READERS[fmt](lines)))
+
+
+@replica_reads
+@query_budget(4)
+@conditional_get
 class CategoryListAPIView(generics.ListAPIView):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return Category.objects.filter(author=self.request.user)
+
+
+@replica_reads
+@query_budget(3)
+class CategoryStatsAPIView(generics.ListAPIView):
+    serializer_class = CategoryStatsSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Category.objects.filter(author=self.request.user).with_task_stats(self.request.user)
+
+
+@replica_reads
+@query_budget(7)
+class SyncAPIView(APIView):
+    """GET /api/sync/?since=<token> - zmiany od poprzedniej synchronizacji; bez tokena pełny stan konta"""
+    permission_classes = [IsAuthenticated]
+    serializers = {
+        ChangeLogEntry.TASK: ('tasks', SyncTaskSerializer),
+        ChangeLogEntry.CATEGORY: ('categories', CategorySerializer),
+        ChangeLogEntry.TAG: ('tags', TagSerializer),
+    }
+
+    def get(self, request):
+        token = request.query_params.get('since')
+        if token:
+            try:
+                since = changelog.decode_token(token)
+            except ValueError as exc:
+                raise ValidationError({'since': str(exc)})
+            changed, removed, last, has_more = changelog.changes_since(request.user, since)
+        else:
+            # token przed odczytem stanu - zmiany w trakcie odczytu klient dostanie jeszcze raz przy kolejnej synchronizacji
+            last, has_more = changelog.latest_change_id(request.user), False
+            changed, removed = None, {kind: [] for kind in changelog.MODELS}
+
+        data = {'token': changelog.encode_token(last), 'has_more': has_more, 'deleted': {}}
+        for kind, model in changelog.MODELS.items():
+            key, serializer_class = self.serializers[kind]
+            objects = model.objects.filter(author=request.user)
+            if changed is not None:
+                objects = objects.filter(id__in=changed[kind])
+            if model is Task:
+                objects = objects.prefetch_related('tags')
+            objects = list(objects.order_by('id'))
+            data[key] = serializer_class(objects, many=True).data
+            # obiekt zmieniony, a potem usunięty - nagrobek leży dalej w dzienniku, ale obiektu już nie ma
+            found = {obj.pk for obj in objects}
+            data['deleted'][key] = removed[kind] + [pk for pk in (changed or {}).get(kind, []) if pk not in found]
+        return Response(data)
+
+
+class DashboardCacheStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(dashboard_cache.stats())
+
+
+def agenda_etag(request, *args, **kwargs):
+    # zakres bez parametrów liczy się od dzisiaj, więc o północy zmienia się także przy tej samej wersji danych
+    return f'{versions.etag(request)}-{timezone.localdate():%Y%m%d}'
+
+
+@replica_reads
+@query_budget(6)
+@method_decorator(condition(etag_func=agenda_etag), name='get')
+class AgendaAPIView(APIView):
+    """GET /api/agenda/?from=RRRR-MM-DD&to=RRRR-MM-DD - zadania z terminem w zakresie (do roku), pogrupowane po dniach"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            start, end = agenda.date_range(request.query_params, timezone.localdate())
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+        return Response({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'days': agenda.group_by_day(agenda.agenda_rows(request.user, start, end)),
+        })
+
+
+@condition(etag_func=agenda_etag)
+def _agenda_feed(request):
+    try:
+        start, end = agenda.date_range(
+            request.GET, timezone.localdate(), default_days=agenda.FEED_DAYS, past_days=agenda.FEED_PAST_DAYS
+        )
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    # adres zadania składany z szablonu - reverse() dla każdego z tysięcy wydarzeń kosztowałby więcej niż reszta kanału
+    task_url = request.build_absolute_uri(reverse('task-detail', args=[agenda.URL_PLACEHOLDER]))
+    task_url = task_url.replace(str(agenda.URL_PLACEHOLDER), '{}').format
+    rows = agenda.iter_ics(agenda.agenda_rows(request.user, start, end), request.get_host(), task_url)
+    response = StreamingResponse(rows, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="zadania.ics"'
+    return response
+
+
+@replica_reads
+@query_budget(6)
+@require_safe
+def agenda_feed(request):
+    """Kanał iCalendar zadań do subskrypcji w kalendarzu - logowanie sesją albo parametrem token (agenda.feed_token)"""
+    if 'token' in request.GET:
+        request.user = agenda.feed_user(request.GET['token'])
+        if request.user is None:
+            return HttpResponseForbidden('Niepoprawny token kanału kalendarza.')
+    elif not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    return _agenda_feed(request)
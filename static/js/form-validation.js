@@ -9,8 +9,9 @@ document.addEventListener('DOMContentLoaded', function() {
         initCategoryFormValidation(categoryForm);
     }
     
-    initToggleAjax();
+    initToggleAjax(document);
     initClearReminderTime();
+    initLoadMore();
 });
 
 function showFieldError(fieldId, message) {
@@ -235,8 +236,8 @@ function initCategoryFormValidation(form) {
     }
 }
 
-function initToggleAjax() {
-    var toggleForms = document.querySelectorAll('.toggle-form');
+function initToggleAjax(root) {
+    var toggleForms = root.querySelectorAll('.toggle-form');
     
     toggleForms.forEach(function(form) {
         form.addEventListener('submit', function(event) {
@@ -260,6 +261,10 @@ function initToggleAjax() {
             })
             .then(function(data) {
                 if (data.success) {
+                    if (data.recurring && !data.is_completed) {
+                        window.location.reload();
+                        return;
+                    }
                     if (data.is_completed) {
                         button.textContent = '✓';
                         if (taskItem) {
@@ -279,3 +284,60 @@ function initToggleAjax() {
         });
     });
 }
+
+function initLoadMore() {
+    var container = document.querySelector('.load-more');
+    if (!container) {
+        return;
+    }
+    var loading = false;
+
+    function loadNextPage(link) {
+        if (loading) {
+            return;
+        }
+        loading = true;
+        fetch(link.href, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(function(response) {
+                return response.text();
+            })
+            .then(function(html) {
+                var page = new DOMParser().parseFromString(html, 'text/html');
+                var list = document.querySelector('.tasks-list');
+                page.querySelectorAll('.tasks-list > .task-item').forEach(function(item) {
+                    var imported = document.importNode(item, true);
+                    list.appendChild(imported);
+                    initToggleAjax(imported);
+                });
+                var nextLink = page.querySelector('.load-more a');
+                if (nextLink) {
+                    link.href = nextLink.href;
+                } else {
+                    container.remove();
+                    if (observer) {
+                        observer.disconnect();
+                    }
+                }
+                loading = false;
+            })
+            .catch(function() {
+                window.location.href = link.href;
+            });
+    }
+
+    var link = container.querySelector('a');
+    link.addEventListener('click', function(event) {
+        event.preventDefault();
+        loadNextPage(link);
+    });
+
+    var observer = null;
+    if ('IntersectionObserver' in window) {
+        observer = new IntersectionObserver(function(entries) {
+            if (entries[0].isIntersecting) {
+                loadNextPage(link);
+            }
+        });
+        observer.observe(container);
+    }
+}